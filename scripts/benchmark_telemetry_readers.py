@@ -0,0 +1,81 @@
+"""Times the telemetry CSV readers: inferred types (the readers before the schemas), the schema with the C engine
+and, when pyarrow is installed, the schema with the pyarrow engine.
+
+Run from the repository root with the datasets in data/:
+    python -m scripts.benchmark_telemetry_readers
+or on a generated TagDetections.csv like file of that many rows:
+    python -m scripts.benchmark_telemetry_readers --synthetic 1000000
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.fish_telemetry_faa.utils.project_constants import ProjectConstants
+from src.fish_telemetry_faa.utils.telemetry_schema import CONSTRAINED_TRANSMITTER_SCHEMA, PYARROW_AVAILABLE, \
+    RECEIVER_SENSOR_SCHEMA, UNCONSTRAINED_DETECTIONS_SCHEMA, TelemetrySchema, read_telemetry_csv
+
+
+def read_with_inferred_types(file: Path, schema: TelemetrySchema) -> pd.DataFrame:
+    # How the readers parsed the files before the schemas existed
+    df = pd.read_csv(file, header=0, encoding="utf-8", skipinitialspace=True, delimiter=schema.delimiter)
+    for column in schema.datetime_columns:
+        df[column] = pd.to_datetime(df[column])
+    for column in schema.decimal_columns:
+        df[column] = df[column].str.replace(",", ".").astype(float)
+    return df
+
+
+def write_synthetic_detections(file: Path, n_rows: int, seed=0):
+    rng = np.random.default_rng(seed)
+    seconds = np.sort(rng.integers(0, 13 * 24 * 3600, n_rows))
+    times = ProjectConstants.START_OF_EXPERIMENT + pd.to_timedelta(seconds, unit="s")
+    depths = pd.Series(rng.uniform(0, 9, n_rows).round(1)).astype(str).str.replace(".", ",", regex=False)
+    pd.DataFrame({"Date and Time (UTC)": times.strftime("%Y-%m-%d %H:%M:%S"),
+                  "ID": rng.integers(1000, 1100, n_rows), "SNR": rng.uniform(10, 50, n_rows).round(1),
+                  "Data2": rng.integers(0, 256, n_rows), "Depth [m] (est. or from tag)": depths}).to_csv(
+        file, sep=";", index=False)
+
+
+def benchmark_telemetry_readers(sources, repeats=3):
+    readers = [("inferred", read_with_inferred_types),
+               ("schema (c)", lambda file, schema: read_telemetry_csv(file, schema, engine="c"))]
+    if PYARROW_AVAILABLE:
+        readers.append(("schema (pyarrow)", lambda file, schema: read_telemetry_csv(file, schema, engine="pyarrow")))
+    else:
+        print("pyarrow is not installed, only the C engine is timed")
+    for source_name, files, schema in sources:
+        timings = {}
+        for reader_name, reader in readers:
+            best = float("inf")
+            for _ in range(repeats):
+                start = time.perf_counter()
+                for file in files:
+                    reader(file, schema)
+                best = min(best, time.perf_counter() - start)
+            timings[reader_name] = best
+        baseline = timings["inferred"]
+        print(f"{source_name} ({len(files)} files): " + ", ".join(
+            f"{reader_name} {seconds:.3f}s (x{baseline / seconds:.1f})" for reader_name, seconds in timings.items()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the telemetry CSV readers")
+    parser.add_argument("--synthetic", type=int, default=None, help="rows of a generated TagDetections.csv")
+    parser.add_argument("--repeats", type=int, default=3)
+    arguments = parser.parse_args()
+    if arguments.synthetic:
+        with tempfile.TemporaryDirectory() as directory:
+            synthetic_file = Path(directory).joinpath("TagDetections.csv")
+            write_synthetic_detections(synthetic_file, arguments.synthetic)
+            benchmark_telemetry_readers([("synthetic unconstrained", [synthetic_file],
+                                          UNCONSTRAINED_DETECTIONS_SCHEMA)], arguments.repeats)
+    else:
+        benchmark_telemetry_readers(
+            [("constrained", sorted(ProjectConstants.CONSTRAINED_TRANSMITTER_DATA.glob("*.csv")),
+              CONSTRAINED_TRANSMITTER_SCHEMA),
+             ("unconstrained", [ProjectConstants.UNCONSTRAINED_RECEIVER_DATA], UNCONSTRAINED_DETECTIONS_SCHEMA),
+             ("receiver", [ProjectConstants.RECEIVERS_SENSOR_DATA], RECEIVER_SENSOR_SCHEMA)], arguments.repeats)
@@ -0,0 +1,132 @@
+import time
+
+import numpy as np
+from scipy import sparse
+from scipy.spatial.distance import pdist, squareform
+from sklearn.cluster import DBSCAN
+from sklearn.metrics import adjusted_rand_score
+from sklearn.neighbors import NearestNeighbors, sort_graph_by_row_values
+
+HOURS_PER_DAY = 24
+CLUSTERING_METHODS = ["dense", "neighbors", "grid"]
+# (time step in hours, depth step in m) of the "grid" method, one minute by 10 cm
+DEFAULT_GRID_STEPS = (1 / 60, 0.1)
+
+
+def cyclic_time_depth_distances(depth_array: np.ndarray, time_array: np.ndarray) -> np.ndarray:
+    """Dense n x n distances of (time of day, depth) points, where the time wraps around midnight."""
+    pd_1 = pdist(depth_array.reshape(-1, 1))
+    pd_2 = pdist(time_array.reshape(-1, 1))
+    # Apply boundary condition to the time component
+    pd_2[pd_2 > HOURS_PER_DAY * 0.5] -= HOURS_PER_DAY
+    norm_values = np.linalg.norm(np.stack((pd_1, pd_2)), axis=0)
+    return squareform(norm_values)
+
+
+def cyclic_radius_neighbors(depth_array: np.ndarray, time_array: np.ndarray, radius: float, batch_size=10000):
+    """All pairs closer than radius under the same metric, as (rows, columns, distances) arrays.
+
+    The 24 h periodic time axis is handled by also querying every point shifted by one day forwards and backwards,
+    so a KD-tree on the plain (time, depth) plane finds the neighbours across midnight too. Every point is its own
+    neighbour with distance 0.
+    """
+    if radius >= HOURS_PER_DAY * 0.5:
+        raise ValueError(f"The radius must be below {HOURS_PER_DAY * 0.5} hours, got {radius}")
+    points = np.column_stack((time_array, depth_array)).astype(float)
+    tree = NearestNeighbors(radius=radius).fit(points)
+    rows, columns, distances = [], [], []
+    for shift in (0, HOURS_PER_DAY, -HOURS_PER_DAY):
+        for start in range(0, len(points), batch_size):
+            queries = points[start:start + batch_size] + [shift, 0]
+            neighbor_distances, neighbor_indices = tree.radius_neighbors(queries, return_distance=True)
+            counts = np.fromiter((len(indices) for indices in neighbor_indices), dtype=np.int64,
+                                 count=len(neighbor_indices))
+            if counts.sum() == 0:
+                continue
+            rows.append(np.repeat(np.arange(start, start + len(queries)), counts))
+            columns.append(np.concatenate(neighbor_indices))
+            distances.append(np.concatenate(neighbor_distances))
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+    return np.concatenate(rows), np.concatenate(columns), np.concatenate(distances)
+
+
+def neighbors_to_graph(rows, columns, distances, n_points) -> sparse.csr_matrix:
+    # Distances of 0 (duplicated points) are kept as explicit entries, DBSCAN treats every stored entry as neighbour
+    graph = sparse.csr_matrix((distances, (rows, columns)), shape=(n_points, n_points))
+    return sort_graph_by_row_values(graph, copy=False, warn_when_not_sorted=False)
+
+
+def cyclic_radius_neighbors_graph(depth_array: np.ndarray, time_array: np.ndarray, radius: float,
+                                  batch_size=10000) -> sparse.csr_matrix:
+    rows, columns, distances = cyclic_radius_neighbors(depth_array, time_array, radius, batch_size)
+    return neighbors_to_graph(rows, columns, distances, len(depth_array))
+
+
+def grid_cells(depth_array: np.ndarray, time_array: np.ndarray, grid_steps=DEFAULT_GRID_STEPS):
+    """Snap the points onto a time x depth grid.
+
+    Returns the depth and time of the occupied cell centres, the number of points in each cell and the cell of every
+    point. The time axis gets a whole number of cells per day, so the cells also wrap around midnight.
+    """
+    time_step, depth_step = grid_steps
+    n_time_cells = max(int(round(HOURS_PER_DAY / time_step)), 1)
+    time_step = HOURS_PER_DAY / n_time_cells
+    time_cells = np.rint(np.asarray(time_array, dtype=float) / time_step).astype(np.int64) % n_time_cells
+    depth_cells = np.rint(np.asarray(depth_array, dtype=float) / depth_step).astype(np.int64)
+    cells, point_cells, counts = np.unique(np.column_stack((time_cells, depth_cells)), axis=0, return_inverse=True,
+                                           return_counts=True)
+    return cells[:, 1] * depth_step, cells[:, 0] * time_step, counts, point_cells.ravel()
+
+
+def cluster_time_depth(depth_array: np.ndarray, time_array: np.ndarray, eps: float, min_samples: int,
+                       method: str = "dense", sample_weight=None, grid_steps=DEFAULT_GRID_STEPS) -> np.ndarray:
+    """DBSCAN labels of (time of day, depth) points under the cyclic metric.
+
+    "dense" builds the full distance matrix (n² memory), "neighbors" a sparse radius neighbours graph with the same
+    distances, which only needs memory for the pairs closer than eps. "grid" clusters the occupied cells of a
+    time x depth grid, weighted by their number of points, and gives every point the label of its cell. It is
+    approximate, every point moves by at most half a grid step, see compare_grid_with_exact.
+    """
+    if method == "grid":
+        cell_depths, cell_times, counts, point_cells = grid_cells(depth_array, time_array, grid_steps)
+        if sample_weight is not None:
+            counts = np.bincount(point_cells, weights=sample_weight, minlength=len(counts))
+        cell_labels = cluster_time_depth(cell_depths, cell_times, eps, min_samples, method="neighbors",
+                                         sample_weight=counts)
+        return cell_labels[point_cells]
+    if method == "dense":
+        distances = cyclic_time_depth_distances(depth_array, time_array)
+    elif method == "neighbors":
+        distances = cyclic_radius_neighbors_graph(depth_array, time_array, radius=eps)
+    else:
+        raise ValueError(f"Unknown clustering method {method}, choose one of {CLUSTERING_METHODS}")
+    clustering = DBSCAN(eps=eps, min_samples=min_samples, metric='precomputed').fit(distances,
+                                                                                     sample_weight=sample_weight)
+    return clustering.labels_
+
+
+def compare_grid_with_exact(depth_array: np.ndarray, time_array: np.ndarray, eps: float, min_samples: int,
+                            grid_steps=DEFAULT_GRID_STEPS) -> dict:
+    """How far the grid labels are from the exact ones, and how long both took."""
+    start = time.perf_counter()
+    exact_labels = cluster_time_depth(depth_array, time_array, eps, min_samples, method="neighbors")
+    exact_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    grid_labels = cluster_time_depth(depth_array, time_array, eps, min_samples, method="grid", grid_steps=grid_steps)
+    grid_seconds = time.perf_counter() - start
+    report = {
+        "n_points": len(depth_array),
+        "n_cells": len(grid_cells(depth_array, time_array, grid_steps)[2]),
+        "adjusted_rand_score": adjusted_rand_score(exact_labels, grid_labels),
+        "noise_mismatch_fraction": np.mean((exact_labels == -1) != (grid_labels == -1)),
+        "exact_clusters": len(set(exact_labels) - {-1}),
+        "grid_clusters": len(set(grid_labels) - {-1}),
+        "exact_seconds": exact_seconds,
+        "grid_seconds": grid_seconds,
+    }
+    print(f"Grid {grid_steps} on {report['n_points']} points in {report['n_cells']} cells: "
+          f"ARI {report['adjusted_rand_score']:.4f}, noise mismatch {report['noise_mismatch_fraction']:.2%}, "
+          f"{report['grid_clusters']} vs {report['exact_clusters']} clusters, "
+          f"{grid_seconds:.2f}s vs {exact_seconds:.2f}s exact")
+    return report
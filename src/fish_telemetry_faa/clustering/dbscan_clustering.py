@@ -1,18 +1,18 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
 from itertools import cycle
 
-import numpy as np
 import pandas as pd
 import plotly
 import plotly.express as px
 import plotly.figure_factory as ff
 import plotly.graph_objects as go
 from _plotly_utils.colors import n_colors
-from scipy.spatial.distance import pdist, squareform
-from sklearn.cluster import DBSCAN
 
-from src.fish_telemetry_faa.statistics.basic_activity_stats import identify_lasting_peaks_all_dates
-from src.fish_telemetry_faa.utils.data_loader import init_standard_data, init_unconstrained_tag_data
-from src.fish_telemetry_faa.utils.sun_times import SunTimer
+from src.fish_telemetry_faa.clustering.cyclic_neighbors import cluster_time_depth, DEFAULT_GRID_STEPS
+from src.fish_telemetry_faa.statistics.basic_activity_stats import identify_lasting_peaks_all_dates, \
+    first_faa_windows_until
+from src.fish_telemetry_faa.utils.data_session import DataSession, get_session
 
 
 def convert_hour2angle(hour):
@@ -105,7 +105,8 @@ def create_polarplot(cluster_df, color_discrete_sequence, column_name: str = "De
 
 def create_2d_scatterplot_fab(cluster_df, color_discrete_sequence, label_set,
                               column_name: str = "Depth [m] (est. or from tag)", reverse_axis: bool = True,
-                              with_faa_bars=True, with_fap_rectangles=True, with_day_night_bars=True):
+                              with_faa_bars=True, with_fap_rectangles=True, with_day_night_bars=True, session=None):
+    session = get_session(session)
     fig = px.scatter(cluster_df.loc[cluster_df["cluster"] != "-1"], x="time_numeric", y=column_name, color="cluster",
                      category_orders={"cluster": [str(x) for x in label_set]},
                      color_discrete_sequence=color_discrete_sequence,
@@ -159,21 +160,17 @@ def create_2d_scatterplot_fab(cluster_df, color_discrete_sequence, label_set,
         font=dict(size=24)
     )
     if with_faa_bars:
-        faa_list = identify_lasting_peaks_all_dates(unconstrained=False, minutes=5)
-        for dff in faa_list:
-            unpacked_df = dff[0]
-            # Always cut off at 8:00
-            unpacked_df = unpacked_df.loc[(unpacked_df["time"].dt.hour <= 7) | (
-                    (unpacked_df["time"].dt.hour <= 8) & (unpacked_df["time"].dt.minute == 0))]
-            fig.add_vrect(x0=unpacked_df["time"].dt.hour[0] + unpacked_df["time"].dt.minute[0] / 60,
-                          x1=unpacked_df["time"].dt.hour[-1] + unpacked_df["time"].dt.minute[-1] / 60,
+        faa_df = identify_lasting_peaks_all_dates(unconstrained=False, minutes=5, session=session)
+        # Always cut off at 8:00
+        for window in first_faa_windows_until(faa_df, hour=8).itertuples():
+            fig.add_vrect(x0=window.faa_start.hour + window.faa_start.minute / 60,
+                          x1=window.faa_end.hour + window.faa_end.minute / 60,
                           annotation_text="FAA", annotation_position="top left",
                           annotation=dict(font_size=30, font_family="Times New Roman"),
                           fillcolor="darkgreen", opacity=0.25, line_width=0)
     if with_day_night_bars:
         greys_dark = n_colors('rgb(0, 0, 0)', 'rgb(255, 255, 255)', 5, colortype='rgb')
-        sun_timer = SunTimer()
-        sun_times_df = sun_timer.get_all_sun_times_variations()
+        sun_times_df = session.sun_timer().get_all_sun_times_variations()
         fig.add_shape(type="rect",
                       x0='0', y0=7,
                       x1='24', y1=7.8,
@@ -236,7 +233,7 @@ def visualize_clustering_with_labels(cluster_df, color_discrete_sequence, label_
                                      column_name: str = "Depth [m] (est. or from tag)",
                                      reverse_axis: bool = True,
                                      with_faa_bars=True, with_fap_rectangles=True, with_day_night_bars=True,
-                                     day_by_day=False):
+                                     day_by_day=False, session=None):
     if not day_by_day:
         create_distplot(cluster_df, color_discrete_sequence, label_set, column_name)
 
@@ -244,46 +241,75 @@ def visualize_clustering_with_labels(cluster_df, color_discrete_sequence, label_
 
     if not day_by_day:
         create_2d_scatterplot_fab(cluster_df, color_discrete_sequence, label_set, column_name, reverse_axis,
-                                  with_faa_bars, with_fap_rectangles, with_day_night_bars)
+                                  with_faa_bars, with_fap_rectangles, with_day_night_bars, session)
 
     if not day_by_day:
         create_2d_histogram(cluster_df, column_name, reverse_axis)
 
 
 def run_clustering(df, clustering_weights, n_clusters=10,
-                   visualize=True, day_by_day=False):
+                   visualize=True, day_by_day=False, session=None, method="dense", grid_steps=DEFAULT_GRID_STEPS,
+                   labels=None):
     cluster_df = df[["Depth [m] (est. or from tag)", "time_numeric"]]
     print(len(cluster_df))
-    depth_array = cluster_df["Depth [m] (est. or from tag)"].values.reshape(
-        cluster_df["Depth [m] (est. or from tag)"].shape[0], 1)
-    time_array = cluster_df["time_numeric"].values.reshape(cluster_df["time_numeric"].shape[0], 1)
-    pd_1 = pdist(depth_array)
-    pd_2 = pdist(time_array)
-    # Apply boundary condition to the time component
-    pd_2[pd_2 > 24 * 0.5] -= 24
-    norm_values = np.linalg.norm(np.stack((pd_1, pd_2)), axis=0)
-    square = squareform(norm_values)
-    clustering = DBSCAN(eps=clustering_weights[0], min_samples=clustering_weights[1], metric='precomputed').fit(square)
-
-    labels = clustering.labels_
+    if labels is None:
+        labels = cluster_time_depth(cluster_df["Depth [m] (est. or from tag)"].to_numpy(),
+                                    cluster_df["time_numeric"].to_numpy(),
+                                    eps=clustering_weights[0], min_samples=clustering_weights[1], method=method,
+                                    grid_steps=grid_steps)
     color_discrete_sequence = px.colors.qualitative.Alphabet if n_clusters > 10 else px.colors.qualitative.Plotly
     cluster_df = cluster_df.assign(cluster=[str(x) for x in labels])
     label_set = sorted(set(labels))
     if visualize:
         visualize_clustering_with_labels(cluster_df=cluster_df, color_discrete_sequence=color_discrete_sequence,
-                                         label_set=label_set, day_by_day=day_by_day)
+                                         label_set=label_set, day_by_day=day_by_day, session=session)
+    return cluster_df
+
+
+def _timed_clustering(depth_array, time_array, eps, min_samples, method, grid_steps):
+    start = time.perf_counter()
+    labels = cluster_time_depth(depth_array, time_array, eps=eps, min_samples=min_samples, method=method,
+                                grid_steps=grid_steps)
+    return labels, time.perf_counter() - start
+
+
+def cluster_day_by_day(df, clustering_weights, method="dense", grid_steps=DEFAULT_GRID_STEPS, n_workers=1):
+    """DBSCAN labels of every date on its own, the dates spread over a process pool when n_workers is not 1.
+
+    The workers only receive the depth and time arrays of their date. Returns the per date groups, their labels and
+    the seconds each clustering took, in date order. n_workers=None uses every CPU.
+    With method="dense" every worker would hold the n x n distance matrix of its date at the same time, so peak memory
+    grows with the number of workers. The pool therefore clusters "dense" with "neighbors", which gives the same labels
+    from the sparse neighbours graph. Run with n_workers=1 to build the dense matrices one date at a time.
+    """
+    groups = list(df.groupby(df["Time (corrected)"].dt.date))
+    if n_workers != 1 and method == "dense":
+        method = "neighbors"
+    arguments = [(group["Depth [m] (est. or from tag)"].to_numpy(), group["time_numeric"].to_numpy(),
+                  clustering_weights[0], clustering_weights[1], method, grid_steps) for _, group in groups]
+    if n_workers == 1:
+        results = [_timed_clustering(*day_arguments) for day_arguments in arguments]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            # map keeps the order of the dates, however the workers finish
+            results = list(executor.map(_timed_clustering, *zip(*arguments)))
+    return [(date, group, labels, seconds) for (date, group), (labels, seconds) in zip(groups, results)]
 
 
 def run_dbscan_clustering_time_depth(df, weights, n_clusters=10,
-                                     visualize=True, day_by_day: bool = False):
+                                     visualize=True, day_by_day: bool = False, session=None, method="dense",
+                                     grid_steps=DEFAULT_GRID_STEPS, n_workers=1):
     if day_by_day:
-        for date, group in df.groupby(df["Time (corrected)"].dt.date):
-            print(f"Clustering for date {date}")
-            small_df = group
-            run_clustering(small_df, weights, n_clusters, visualize, day_by_day)
+        cluster_dfs = []
+        for date, group, labels, seconds in cluster_day_by_day(df, weights, method, grid_steps, n_workers):
+            print(f"Clustering for date {date} took {seconds:.2f}s")
+            cluster_df = run_clustering(group, weights, n_clusters, visualize, day_by_day, session, labels=labels)
+            cluster_dfs.append(cluster_df.assign(date=date, clustering_seconds=seconds))
+        return pd.concat(cluster_dfs)
     else:
         print(f"Clustering for all dates")
-        run_clustering(df, weights, n_clusters, visualize)
+        return run_clustering(df, weights, n_clusters, visualize, session=session, method=method,
+                              grid_steps=grid_steps)
 
 
 if __name__ == "__main__":
@@ -292,11 +318,9 @@ if __name__ == "__main__":
     by_day = False
     parameters = [0.5, 300]
     clusters = 10
-    if unconstrained:
-        data = init_unconstrained_tag_data()
-    else:
-        data = init_standard_data()
+    data_session = DataSession()
+    data = data_session.init_tag_data(unconstrained=unconstrained)
     run_dbscan_clustering_time_depth(df=data,
                                      weights=parameters,
                                      n_clusters=clusters,
-                                     visualize=True, day_by_day=by_day)
+                                     visualize=True, day_by_day=by_day, session=data_session)
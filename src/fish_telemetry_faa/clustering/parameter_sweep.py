@@ -0,0 +1,82 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import DBSCAN
+from sklearn.metrics import silhouette_score
+
+from src.fish_telemetry_faa.clustering.cyclic_neighbors import cyclic_radius_neighbors_graph, \
+    cyclic_time_depth_distances
+from src.fish_telemetry_faa.utils.data_session import DataSession
+
+# Set once per worker by _init_sweep, so the graph is not pickled again for every setting
+_graph = None
+_sample_indices = None
+_sample_distances = None
+
+
+def _init_sweep(graph, sample_indices, sample_distances):
+    global _graph, _sample_indices, _sample_distances
+    _graph = graph
+    _sample_indices = sample_indices
+    _sample_distances = sample_distances
+
+
+def _sample_silhouette(labels):
+    # Silhouette of the clustered (non noise) points of the sample under the cyclic metric
+    sample_labels = labels[_sample_indices]
+    clustered = sample_labels != -1
+    if len(set(sample_labels[clustered])) < 2:
+        return np.nan
+    return silhouette_score(_sample_distances[np.ix_(clustered, clustered)], sample_labels[clustered],
+                            metric="precomputed")
+
+
+def _evaluate_setting(eps, min_samples):
+    start = time.perf_counter()
+    # DBSCAN only uses the stored distances up to its own eps, so the graph of the largest eps serves every setting
+    labels = DBSCAN(eps=eps, min_samples=min_samples, metric="precomputed").fit(_graph).labels_
+    cluster_sizes = np.bincount(labels[labels != -1])
+    return {
+        "eps": eps,
+        "min_samples": min_samples,
+        "n_clusters": len(cluster_sizes),
+        "noise_fraction": np.mean(labels == -1),
+        "largest_cluster_fraction": cluster_sizes.max() / len(labels) if len(cluster_sizes) else 0.0,
+        "silhouette": _sample_silhouette(labels),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def sweep_dbscan_parameters(depth_array: np.ndarray, time_array: np.ndarray, eps_values, min_samples_values,
+                            n_workers=1, silhouette_sample_size=2000, random_state=0) -> pd.DataFrame:
+    """Cluster every combination of eps and min_samples from one radius neighbours graph.
+
+    The graph is built once at the largest eps and handed to each worker once. The silhouette is computed on a fixed
+    random sample of the points, so the scores of all settings are comparable. n_workers=None uses every CPU.
+    """
+    start = time.perf_counter()
+    graph = cyclic_radius_neighbors_graph(depth_array, time_array, radius=max(eps_values))
+    print(f"Neighbours graph with {graph.nnz} pairs at eps {max(eps_values)} took {time.perf_counter() - start:.2f}s")
+    rng = np.random.RandomState(random_state)
+    sample_indices = np.sort(rng.choice(len(depth_array), min(silhouette_sample_size, len(depth_array)),
+                                        replace=False))
+    sample_distances = cyclic_time_depth_distances(depth_array[sample_indices], time_array[sample_indices])
+    settings = list(product(sorted(eps_values), sorted(min_samples_values)))
+    if n_workers == 1:
+        _init_sweep(graph, sample_indices, sample_distances)
+        results = [_evaluate_setting(eps, min_samples) for eps, min_samples in settings]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_sweep,
+                                 initargs=(graph, sample_indices, sample_distances)) as executor:
+            results = list(executor.map(_evaluate_setting, *zip(*settings)))
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    data = DataSession().init_standard_data()
+    sweep = sweep_dbscan_parameters(data["Depth [m] (est. or from tag)"].to_numpy(), data["time_numeric"].to_numpy(),
+                                    eps_values=[0.25, 0.5, 0.75], min_samples_values=[25, 100, 300], n_workers=None)
+    print(sweep.to_string(index=False))
@@ -3,18 +3,14 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from scipy.stats import pearsonr
 
-from src.fish_telemetry_faa.utils.data_loader import init_unconstrained_tag_data, init_standard_data, \
-    init_receiver_sensor_data
+from src.fish_telemetry_faa.utils.data_session import get_session
 
 
 def correlate_temperature_with_activity_generic(df_act: pandas.DataFrame, df_temp: pandas.DataFrame):
-    df_act_resampled = df_act.resample(f'{minutes}min', label='left', closed='left',
-                                       offset=f"{0}min",
-                                       on="Time (corrected)").mean()
+    # Both are binned tables of DataSession.binned_statistics
+    df_act_resampled = df_act.xs("mean", axis=1, level=1)
     df_act_resampled["time_resampled"] = df_act_resampled.index
-    df_temp_resampled = df_temp.resample(f'{minutes}min', label='left', closed='left',
-                                         offset=f"{0}min",
-                                         on="Time (corrected)").mean()
+    df_temp_resampled = df_temp.xs("mean", axis=1, level=1)
     df_temp_resampled["time_resampled"] = df_temp_resampled.index
     # Testing for positive or negative correlation
     res = pearsonr(df_act_resampled["activity"], df_temp_resampled["temperature"],
@@ -36,37 +32,37 @@ def correlate_temperature_with_activity_generic(df_act: pandas.DataFrame, df_tem
     fig.show()
 
 
-def correlate_temp_with_activity():
-    df = init_standard_data()
-    df_act = df.loc[df["is_activity"]]
-    df_temp = df.loc[df["is_temperature"]]
+def correlate_temp_with_activity(minutes=20, session=None):
+    session = get_session(session)
+    df_act = session.binned_statistics(minutes, "init_standard_data", sensor="activity")
+    df_temp = session.binned_statistics(minutes, "init_standard_data", sensor="temperature")
     correlate_temperature_with_activity_generic(df_act=df_act, df_temp=df_temp)
 
 
-def correlate_temp_with_activity_both_unconstrained():
-    df = init_unconstrained_tag_data()
-    df_act = df.loc[df["is_activity"]]
-    df_temp = df.loc[df["is_temperature"]]
+def correlate_temp_with_activity_both_unconstrained(minutes=20, session=None):
+    session = get_session(session)
+    df_act = session.binned_statistics(minutes, "init_unconstrained_tag_data", sensor="activity")
+    df_temp = session.binned_statistics(minutes, "init_unconstrained_tag_data", sensor="temperature")
     correlate_temperature_with_activity_generic(df_act=df_act, df_temp=df_temp)
 
 
-def correlate_receiver_temp_with_activity():
-    df = init_standard_data()
-    df_temp_rec = init_receiver_sensor_data()
-    df_act = df.loc[df["is_activity"]]
+def correlate_receiver_temp_with_activity(minutes=20, session=None):
+    session = get_session(session)
+    df_act = session.binned_statistics(minutes, "init_standard_data", sensor="activity")
+    df_temp_rec = session.binned_statistics(minutes, "init_receiver_sensor_data")
     correlate_temperature_with_activity_generic(df_act=df_act, df_temp=df_temp_rec)
 
 
-def correlate_receiver_temp_with_activity_unconstrained():
-    df = init_unconstrained_tag_data()
-    df_temp_rec = init_receiver_sensor_data()
-    df_act = df.loc[df["is_activity"]]
+def correlate_receiver_temp_with_activity_unconstrained(minutes=20, session=None):
+    session = get_session(session)
+    df_act = session.binned_statistics(minutes, "init_unconstrained_tag_data", sensor="activity")
+    df_temp_rec = session.binned_statistics(minutes, "init_receiver_sensor_data")
     correlate_temperature_with_activity_generic(df_act=df_act, df_temp=df_temp_rec)
 
 
 if __name__ == "__main__":
     minutes = 20
-    correlate_temp_with_activity()  # stat 6, no correlation
-    correlate_temp_with_activity_both_unconstrained()  # stat 6, no correlation
-    correlate_receiver_temp_with_activity()  # stat 6, no correlation
-    correlate_receiver_temp_with_activity_unconstrained()  # stat 6, no correlation
+    correlate_temp_with_activity(minutes)  # stat 6, no correlation
+    correlate_temp_with_activity_both_unconstrained(minutes)  # stat 6, no correlation
+    correlate_receiver_temp_with_activity(minutes)  # stat 6, no correlation
+    correlate_receiver_temp_with_activity_unconstrained(minutes)  # stat 6, no correlation
@@ -0,0 +1,202 @@
+import bisect
+
+import numpy as np
+import pandas as pd
+
+from src.fish_telemetry_faa.statistics.parallel_resampling import map_blocks, repetition_blocks
+from src.fish_telemetry_faa.utils.data_session import get_session
+
+
+def running_quantile(sorted_values, quantile):
+    # Linear interpolation between the closest ranks, like pandas' quantile
+    position = quantile * (len(sorted_values) - 1)
+    lower = int(np.floor(position))
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def run_length_encode(values: np.ndarray):
+    """Start and stop (exclusive) index and value of every run of equal consecutive values."""
+    values = np.asarray(values)
+    if len(values) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), values
+    changes = np.flatnonzero(values[1:] != values[:-1]) + 1
+    starts = np.concatenate(([0], changes))
+    stops = np.concatenate((changes, [len(values)]))
+    return starts, stops, values[starts]
+
+
+def faa_windows(activity: pd.Series, quantile=0.5, faa_duration=6, latest_start_hour=None, by=None) -> pd.DataFrame:
+    """All runs of at least faa_duration bins at or above the quantile of their day, as one table.
+
+    activity holds the binned activity indexed by the bin start times, sorted by time (within each group of by). by
+    optionally labels every bin with e.g. its fish, the quantiles and runs are then taken per group and day. Empty
+    (NaN) bins interrupt a run. With latest_start_hour only runs starting before that hour are kept.
+    """
+    times = pd.DatetimeIndex(activity.index)
+    days = times.normalize()
+    keys = [days] if by is None else [np.asarray(by), days]
+    threshold = activity.groupby(keys, sort=False).transform("quantile", quantile).to_numpy()
+    above = (activity.to_numpy() >= threshold)
+    # A run ends where the bins change between above and below the threshold, or move to another day or group
+    boundaries = np.concatenate(([False], above[1:] != above[:-1]))
+    for key in keys:
+        key = np.asarray(key)
+        boundaries[1:] |= key[1:] != key[:-1]
+    starts, stops, _ = run_length_encode(np.cumsum(boundaries))
+    keep = above[starts] & (stops - starts >= faa_duration)
+    if latest_start_hour is not None:
+        keep &= times[starts].hour < latest_start_hour
+    starts, stops = starts[keep], stops[keep]
+    windows = pd.DataFrame({"date": days[starts].date, "faa_start": times[starts], "faa_end": times[stops - 1],
+                            "n_bins": stops - starts, "threshold": threshold[starts]})
+    if by is not None:
+        windows.insert(0, "group", np.asarray(by)[starts])
+    return windows
+
+
+def resample_activity_per_fish(df: pd.DataFrame, minutes=20, fish_column="fish_number") -> pd.Series:
+    """Mean activity of every fish in bins of the given minutes, indexed by (fish, bin start)."""
+    df = df.loc[df["is_activity"], [fish_column, "Time (corrected)", "activity"]].reset_index(drop=True)
+    return df.groupby(fish_column).resample(f'{minutes}min', label='left', closed='left',
+                                            offset=f"{0}min",
+                                            on="Time (corrected)")["activity"].mean()
+
+
+def _faa_windows_of_fish(activity, fish_offsets, quantile, faa_duration, latest_start_hour, start, stop):
+    fish_activity = activity.iloc[fish_offsets[start]:fish_offsets[stop]]
+    return faa_windows(fish_activity.droplevel(0), quantile, faa_duration, latest_start_hour,
+                       by=fish_activity.index.get_level_values(0))
+
+
+def per_fish_faa_onsets(unconstrained: bool = False, minutes=20, quantile=0.5, faa_duration=6, latest_start_hour=8,
+                        n_workers=None, fish_per_block=16, session=None) -> pd.DataFrame:
+    """FAA onset (hour of the day) of every fish on every day, NaN where a fish showed no FAA.
+
+    All fish are resampled in one groupby, blocks of fish_per_block fish are then searched for FAA windows on a
+    process pool. The thresholds and runs are per fish and day, like identify_lasting_peaks does for the group mean.
+    """
+    df = get_session(session).init_tag_data(unconstrained=unconstrained)
+    activity = resample_activity_per_fish(df, minutes)
+    fish = activity.index.get_level_values(0)
+    # Position of the first bin of every fish, and the end of the last
+    fish_offsets = np.flatnonzero(np.concatenate(([True], fish[1:] != fish[:-1], [True])))
+    n_fish = len(fish_offsets) - 1
+    windows = pd.concat(map_blocks(_faa_windows_of_fish, repetition_blocks(n_fish, fish_per_block),
+                                   (activity, fish_offsets, quantile, faa_duration, latest_start_hour), n_workers))
+    first_windows = windows.groupby(["group", "date"], sort=False).head(1)
+    onsets = first_windows.assign(
+        onset=first_windows["faa_start"].dt.hour + first_windows["faa_start"].dt.minute / 60).pivot(
+        index="group", columns="date", values="onset")
+    onsets = onsets.reindex(index=fish.unique(), columns=sorted(set(activity.index.get_level_values(1).date)))
+    onsets.index.name = "fish_number"
+    print(f"FAA onsets of {n_fish} fish, {onsets.notna().sum().sum()} of {onsets.size} fish days with FAA")
+    return onsets
+
+
+class IncrementalFAADetector:
+    """Flags FAA while the activity detections come in, instead of on a closed batch like identify_lasting_peaks.
+
+    The detections are averaged over bins of the given minutes. Once a bin is complete it is compared with the
+    quantile of the bins of its day so far. A run of faa_duration bins at or above that threshold, starting before
+    latest_start_hour, emits a "start" event, and the first bin below the threshold (or an empty bin, or the end of the
+    day) after it an "end" event. The threshold only knows the day up to the bin, so early bins of a day are judged
+    against fewer values than in the batch analysis.
+    """
+
+    def __init__(self, minutes=20, quantile=0.5, faa_duration=6, latest_start_hour=8):
+        self.bin_width = pd.Timedelta(minutes=minutes)
+        self.quantile = quantile
+        self.faa_duration = faa_duration
+        self.latest_start_hour = latest_start_hour
+        self._bin_start = None
+        self._bin_sum = 0.0
+        self._bin_count = 0
+        self._day = None
+        self._day_means = []
+        self._last_closed_bin = None
+        self._run_start = None
+        self._run_length = 0
+        self._in_faa = False
+
+    def add_detections(self, times, activities):
+        """Feed detections in time order, returns the events of the bins they completed."""
+        times = pd.DatetimeIndex(times)
+        activities = np.asarray(activities, dtype=float)
+        bins = times.floor(self.bin_width)
+        if len(bins) and (not bins.is_monotonic_increasing or (self._bin_start is not None and
+                                                               bins[0] < self._bin_start)):
+            raise ValueError("Detections have to arrive in time order")
+        events = []
+        boundaries = np.flatnonzero(bins[1:] != bins[:-1]) + 1
+        for start, stop in zip(np.concatenate(([0], boundaries)), np.concatenate((boundaries, [len(bins)]))):
+            if bins[start] != self._bin_start:
+                events += self._close_bin()
+                self._bin_start = bins[start]
+            self._bin_sum += activities[start:stop].sum()
+            self._bin_count += stop - start
+        return events
+
+    def flush(self):
+        """Close the open bin and run, e.g. when the detections of the day are complete."""
+        events = self._close_bin()
+        events += self._end_run(self._last_closed_bin + self.bin_width if self._last_closed_bin is not None else None)
+        return events
+
+    def _end_run(self, end_time):
+        events = []
+        if self._in_faa:
+            events.append({"event": "end", "day": self._day, "faa_start": self._run_start, "faa_end": end_time})
+        self._run_start = None
+        self._run_length = 0
+        self._in_faa = False
+        return events
+
+    def _close_bin(self):
+        if self._bin_start is None or self._bin_count == 0:
+            return []
+        bin_start, mean = self._bin_start, self._bin_sum / self._bin_count
+        self._bin_sum, self._bin_count = 0.0, 0
+        events = []
+        if bin_start.date() != self._day:
+            events += self._end_run(self._last_closed_bin + self.bin_width if self._last_closed_bin is not None
+                                    else None)
+            self._day = bin_start.date()
+            self._day_means = []
+        elif bin_start - self._last_closed_bin > self.bin_width:
+            # An empty bin interrupts the run
+            events += self._end_run(self._last_closed_bin + self.bin_width)
+        self._last_closed_bin = bin_start
+        bisect.insort(self._day_means, mean)
+        threshold = running_quantile(self._day_means, self.quantile)
+        if mean < threshold:
+            return events + self._end_run(bin_start)
+        if self._run_length == 0:
+            self._run_start = bin_start
+        self._run_length += 1
+        if (self._run_length == self.faa_duration and not self._in_faa and
+                self._run_start.hour < self.latest_start_hour):
+            self._in_faa = True
+            events.append({"event": "start", "day": self._day, "faa_start": self._run_start,
+                           "detected_at": bin_start + self.bin_width, "threshold": threshold})
+        return events
+
+
+def replay_incremental_faa_detection(unconstrained: bool = False, minutes=20, chunk_size=500, session=None):
+    """Feed the recorded activity detections to an IncrementalFAADetector in chunks, as they would arrive live."""
+    df = get_session(session).init_tag_data(unconstrained=unconstrained)
+    df = df.loc[df["is_activity"]].sort_values("Time (corrected)")
+    detector = IncrementalFAADetector(minutes=minutes)
+    events = []
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        events += detector.add_detections(chunk["Time (corrected)"], chunk["activity"])
+    events += detector.flush()
+    events_df = pd.DataFrame(events)
+    print(events_df)
+    return events_df
+
+
+if __name__ == "__main__":
+    replay_incremental_faa_detection(unconstrained=False, minutes=20)
+    print(per_fish_faa_onsets(unconstrained=False, minutes=20))
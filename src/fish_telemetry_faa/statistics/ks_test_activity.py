@@ -5,24 +5,14 @@ import plotly.graph_objects as go
 from scipy.stats import ks_2samp
 from statsmodels.tsa.seasonal import seasonal_decompose
 
-from src.fish_telemetry_faa.utils.data_loader import init_standard_data, init_unconstrained_tag_data
+from src.fish_telemetry_faa.utils.data_session import get_session
 
 
-def ks_test_act_with_unconstrained_act_tags(minutes=20):
-    df = init_standard_data()
-    df_2 = init_unconstrained_tag_data()
-    df = df.loc[df["is_activity"]]
-    df_2 = df_2.loc[df_2["is_activity"]]
-
-    df = df.resample(f'{minutes}min', label='left', closed='left',
-                     offset=f"{0}min",
-                     on="Time (corrected)").mean()
-    df_2 = df_2.resample(f'{minutes}min', label='left', closed='left',
-                         offset=f"{0}min",
-                         on="Time (corrected)").mean()
-    df["time_resampled"] = df.index
-    df_2["time_resampled"] = df_2.index
-    ks_result = ks_2samp(df["activity"], df_2["activity"])
+def ks_test_act_with_unconstrained_act_tags(minutes=20, session=None):
+    session = get_session(session)
+    df = session.binned_statistics(minutes, "init_standard_data", sensor="activity")
+    df_2 = session.binned_statistics(minutes, "init_unconstrained_tag_data", sensor="activity")
+    ks_result = ks_2samp(df[("activity", "mean")], df_2[("activity", "mean")])
     print(ks_result)
 
 
@@ -41,15 +31,11 @@ def ks_test_act_with_unconstrained_act_tags(minutes=20):
 #     print(features)
 
 
-def seasonal_decomposition_of_activity(minutes):
-    df = init_standard_data()
-    df = df.loc[df["is_activity"]]
-    df = df.resample(f'{minutes}min', label='left', closed='left',
-                     offset=f"{0}min",
-                     on="Time (corrected)").mean()
+def seasonal_decomposition_of_activity(minutes, session=None):
+    df = get_session(session).activity_cube("init_standard_data").binned(minutes, "activity")
     # seasonal decomposition of observed data
     # 24*3 for daily pattern
-    result = seasonal_decompose(df["activity"], model="additive", period=24 * 3)
+    result = seasonal_decompose(df[("activity", "mean")].rename("activity"), model="additive", period=24 * 3)
     fig = go.Figure()
     fig.add_trace(go.Line(x=result.trend.index, y=result.trend, mode='lines', name="Trend", line=dict(color='blue')))
     fig.add_trace(
@@ -1,20 +1,13 @@
 from scipy.stats import ks_2samp
 
-from src.fish_telemetry_faa.utils.data_loader import init_standard_data, init_unconstrained_tag_data
+from src.fish_telemetry_faa.utils.data_session import get_session
 
 
-def ks_test_depth_with_unconstrained_depth(minutes=20):
-    df = init_standard_data()
-    df_2 = init_unconstrained_tag_data()
-    df = df.resample(f'{minutes}min', label='left', closed='left',
-                     offset=f"{0}min",
-                     on="Time (corrected)").mean()
-    df_2 = df_2.resample(f'{minutes}min', label='left', closed='left',
-                         offset=f"{0}min",
-                         on="Time (corrected)").mean()
-    df["time_resampled"] = df.index
-    df_2["time_resampled"] = df_2.index
-    ks_result = ks_2samp(df["Depth [m] (est. or from tag)"], df_2["Depth [m] (est. or from tag)"])
+def ks_test_depth_with_unconstrained_depth(minutes=20, session=None):
+    session = get_session(session)
+    df = session.binned_statistics(minutes, "init_standard_data")
+    df_2 = session.binned_statistics(minutes, "init_unconstrained_tag_data")
+    ks_result = ks_2samp(df[("Depth [m] (est. or from tag)", "mean")], df_2[("Depth [m] (est. or from tag)", "mean")])
     print(ks_result)
 
 
@@ -0,0 +1,55 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+
+# Arguments every block of a run needs, set once per worker process by _init_shared
+_shared = ()
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def _init_shared(*shared_arguments):
+    global _shared
+    _shared = shared_arguments
+
+
+def _run_block(function, start, stop):
+    return function(*_shared, start, stop)
+
+
+def repetition_blocks(repetitions, block_size):
+    return [(start, min(start + block_size, repetitions)) for start in range(0, repetitions, block_size)]
+
+
+def map_blocks(function, blocks, shared_arguments=(), n_workers=None):
+    """function(*shared_arguments, start, stop) for every (start, stop) block, results in block order.
+
+    The blocks are spread over a process pool, which receives the shared arguments once per worker. n_workers=None
+    uses every CPU. The blocks and their seeds never depend on the worker count, so neither do the results.
+    """
+    if n_workers is None:
+        n_workers = default_workers()
+    starts = [start for start, _ in blocks]
+    stops = [stop for _, stop in blocks]
+    if n_workers == 1 or len(blocks) == 1:
+        _init_shared(*shared_arguments)
+        return list(map(_run_block, repeat(function), starts, stops))
+    with ProcessPoolExecutor(max_workers=min(n_workers, len(blocks)), initializer=_init_shared,
+                             initargs=shared_arguments) as executor:
+        return list(executor.map(_run_block, repeat(function), starts, stops))
+
+
+def permutation_p_value(observed, null_distribution, alternative):
+    """p value of a randomized scipy permutation_test, with its tolerance and +1 adjustment."""
+    eps = 1e-14
+    gamma = np.maximum(eps, np.abs(eps * observed))
+    n_resamples = len(null_distribution)
+    less = (np.sum(null_distribution <= observed + gamma) + 1) / (n_resamples + 1)
+    greater = (np.sum(null_distribution >= observed - gamma) + 1) / (n_resamples + 1)
+    p_values = {"less": less, "greater": greater, "two-sided": np.minimum(less, greater) * 2}
+    return np.clip(p_values[alternative], 0, 1)
+
@@ -1,81 +1,117 @@
 import numpy as np
-import pandas
-import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from _plotly_utils.colors import n_colors
 from numpy.random import lognormal
-from scipy.stats import combine_pvalues
-from statsmodels.stats.proportion import proportions_chisquare
+from scipy.stats import chi2, combine_pvalues
 
-from src.fish_telemetry_faa.utils.data_loader import init_standard_data, init_unconstrained_tag_data
+from src.fish_telemetry_faa.statistics.parallel_resampling import map_blocks, repetition_blocks
+from src.fish_telemetry_faa.utils.data_session import get_session
 
 
-def get_water_column_counts(df, water_column: str, interval_minutes: int):
-    df_resampled = df.loc[df["water_column"] == water_column].resample(f'{interval_minutes}min', label='left',
-                                                                       closed='left',
-                                                                       offset=f"{0}min",
-                                                                       on="Time (corrected)", ).count()
-    df_shuffle = df_resampled.copy()
-    df_shuffle[:] = df_shuffle.sample(frac=1).values
-    counts = df_shuffle.pivot_table(index=df_shuffle.index.hour,
-                                    values="water_column",
-                                    aggfunc='sum')
-    counts[water_column] = counts["water_column"]
-    counts = counts.drop(columns="water_column")
-    return counts
+WATER_COLUMNS = ["0-3m", "3-6m", "6-9m"]
 
 
-def get_all_water_column_counts(df, interval_minutes: int = 120):
-    all_water_cols = []
-    for col in ["0-3m", "3-6m", "6-9m"]:
-        all_water_cols.append(get_water_column_counts(df, col, interval_minutes))
-    data_frame = pd.DataFrame(pd.concat(all_water_cols, axis=1), columns=["0-3m", "3-6m", "6-9m"])
-    return data_frame
+def resample_water_column_counts(df, interval_minutes: int):
+    """Number of detections in every resample bin of each water column, with the hour each bin starts in.
 
+    Every water column is resampled over its own time range, like the repetitions of the test always did.
+    """
+    resampled = []
+    for water_column in WATER_COLUMNS:
+        counts = df.loc[df["water_column"] == water_column].resample(f'{interval_minutes}min', label='left',
+                                                                     closed='left', offset=f"{0}min",
+                                                                     on="Time (corrected)")["water_column"].count()
+        resampled.append((counts.to_numpy(), counts.index.hour.to_numpy()))
+    return resampled
 
-def run_proportions_chisquare_on_water_column(index, water_column: str, base_counts, shuffled_counts, verbose=True):
-    if verbose:
-        print(f"The proportions Stats number {index} for the intervals of the day for {water_column}:")
-    stat, p, expected = proportions_chisquare(
-        np.array([np.array(base_counts[water_column]), np.array(shuffled_counts[water_column])]),
-        nobs=pandas.DataFrame(
-            np.array([np.array(base_counts[water_column]), np.array(shuffled_counts[water_column])])).sum(
-            axis=0))
-    if verbose:
-        print(f"{stat=}, {p=}")
-    return p
+
+def seeded_permutations(resampled, seeds):
+    """Bin permutations of every water column for each seed, drawn in the order the sequential test drew them.
+
+    Repetition i seeded the global generator with i and shuffled the columns one after another, so row i of each
+    array is the permutation that repetition applied.
+    """
+    permutations = [np.empty((len(seeds), len(counts)), dtype=np.int64) for counts, _ in resampled]
+    for row, seed in enumerate(seeds):
+        random_state = np.random.RandomState(seed)
+        for column_permutations, (counts, _) in zip(permutations, resampled):
+            column_permutations[row] = random_state.permutation(len(counts))
+    return permutations
+
+
+def hourly_sums(counts, bin_hours, permutations, hours):
+    """Detections per hour after moving the bin counts by each row of permutations, NaN for hours without bins."""
+    one_hot = (bin_hours[:, None] == hours[None, :]).astype(np.float64)
+    sums = counts[permutations] @ one_hot
+    sums[:, ~one_hot.any(axis=0)] = np.nan
+    return sums
+
+
+def proportions_chisquare_p_values(base_counts, shuffled_counts):
+    """p values of statsmodels' proportions_chisquare of the base counts against every row of shuffled_counts."""
+    count = np.stack(np.broadcast_arrays(base_counts, shuffled_counts), axis=1)
+    nobs = count.sum(axis=1, keepdims=True)
+    table = np.concatenate((count, nobs - count), axis=2)
+    expected = table.sum(axis=1, keepdims=True) * table.sum(axis=2, keepdims=True) / table.sum(axis=(1, 2),
+                                                                                              keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        stat = ((table - expected) ** 2 / expected).reshape(len(table), -1).sum(axis=1)
+    # proportions_chisquare passes ddof = number of rows (2) to scipy's chisquare
+    return stat, chi2.sf(stat, table[0].size - 1 - table.shape[1])
+
+
+def shuffle_test_p_values(resampled, base_counts, hours, seeds):
+    """Chi-square statistics and p values of the repetitions with the given seeds, one (stat, p) pair per column."""
+    results = []
+    for (counts, bin_hours), column_permutations, column_base_counts in zip(
+            resampled, seeded_permutations(resampled, seeds), base_counts):
+        shuffled_counts = hourly_sums(counts, bin_hours, column_permutations, hours)
+        results.append(proportions_chisquare_p_values(column_base_counts, shuffled_counts))
+    return results
 
 
-def run_shuffle_test(df, repetitions, interval_minutes, verbose=True):
-    base_counts = get_all_water_column_counts(df, interval_minutes=interval_minutes)
-    p_value_dict = {"03": [], "36": [], "69": []}
-    for i in range(repetitions):
-        np.random.seed(i)
-        # First sample, THEN permute the data values
-        shuffled_counts = get_all_water_column_counts(df, interval_minutes=interval_minutes)
+def _shuffle_test_block(resampled, base_counts, hours, start, stop):
+    return shuffle_test_p_values(resampled, base_counts, hours, range(start, stop))
 
-        temp_p_value = run_proportions_chisquare_on_water_column(i, "0-3m", base_counts, shuffled_counts, verbose)
-        p_value_dict["03"].append(temp_p_value)
-        temp_p_value = run_proportions_chisquare_on_water_column(i, "3-6m", base_counts, shuffled_counts, verbose)
-        p_value_dict["36"].append(temp_p_value)
-        temp_p_value = run_proportions_chisquare_on_water_column(i, "6-9m", base_counts, shuffled_counts, verbose)
-        p_value_dict["69"].append(temp_p_value)
+
+def run_shuffle_test(df, repetitions, interval_minutes, verbose=True, n_workers=None, block_size=1000):
+    """(stat, p) arrays of the repetitions and the Fisher combined (stat, p) of every water column.
+
+    Repetition i draws its permutations from seed i, so the results do not depend on n_workers or block_size.
+    """
+    resampled = resample_water_column_counts(df, interval_minutes=interval_minutes)
+    hours = np.unique(np.concatenate([bin_hours for _, bin_hours in resampled]))
+    # The base counts are shuffled as well, from whatever state the global generator is in
+    base_counts = [hourly_sums(counts, bin_hours, np.random.permutation(len(counts))[None, :], hours)[0]
+                   for counts, bin_hours in resampled]
+    # Repetition i keeps seed i in whichever block and worker it runs
+    block_results = map_blocks(_shuffle_test_block, repetition_blocks(repetitions, block_size),
+                               (resampled, base_counts, hours), n_workers)
+    results = [tuple(np.concatenate([block[column][part] for block in block_results]) for part in range(2))
+               for column in range(len(WATER_COLUMNS))]
+    if verbose:
+        for i in range(repetitions):
+            for water_column, (stat, p) in zip(WATER_COLUMNS, results):
+                print(f"The proportions Stats number {i} for the intervals of the day for {water_column}:")
+                print(f"stat={stat[i]}, p={p[i]}")
 
     # Fisher method to combine p values
-    stat, p = combine_pvalues(p_value_dict["03"])
-    print(f"After fishers method for 03: {stat, p}")
-    stat, p = combine_pvalues(p_value_dict["36"])
-    print(f"After fishers method for 36: {stat, p}")
-    stat, p = combine_pvalues(p_value_dict["69"])
-    print(f"After fishers method for 69: {stat, p}")
+    combined = []
+    for name, (_, p_values) in zip(["03", "36", "69"], results):
+        stat, p = combine_pvalues(p_values)
+        print(f"After fishers method for {name}: {stat, p}")
+        combined.append((stat, p))
+    return results, combined
 
 
-def run_shuffle_test_time(repetitions, interval_minutes: int, individual_days=False, unconstrained=False, verbose=True):
+def run_shuffle_test_time(repetitions, interval_minutes: int, individual_days=False, unconstrained=False, verbose=True,
+                          session=None, n_workers=None):
+    session = get_session(session)
     if unconstrained:
-        df = init_unconstrained_tag_data()
+        df = session.init_unconstrained_tag_data()
     else:
-        df = init_standard_data()
+        df = session.init_standard_data()
         df["water_column"] = "ERROR"
     df.loc[df["Depth [m] (est. or from tag)"] < 3, "water_column"] = "0-3m"
     df.loc[(3 <= df["Depth [m] (est. or from tag)"]) & (
@@ -85,9 +121,9 @@ def run_shuffle_test_time(repetitions, interval_minutes: int, individual_days=Fa
         for date in sorted(set(df["Time (corrected)"].dt.date)):
             print(f"Run shuffle test time for Day {date}")
             run_shuffle_test(df.loc[df["Time (corrected)"].dt.date == date], repetitions, interval_minutes,
-                             verbose)
+                             verbose, n_workers)
     else:
-        run_shuffle_test(df, repetitions, interval_minutes)
+        run_shuffle_test(df, repetitions, interval_minutes, n_workers=n_workers)
 
 
 def plot_no_shuffled_data_time_of_days(df):
@@ -123,11 +159,8 @@ def plot_no_shuffled_data_time_of_days(df):
     fig.show()
 
 
-def visualize_no_shuffled_data_time_of_days(unconstrained=False, individual_days=False):
-    if unconstrained:
-        df = init_unconstrained_tag_data()
-    else:
-        df = init_standard_data()
+def visualize_no_shuffled_data_time_of_days(unconstrained=False, individual_days=False, session=None):
+    df = get_session(session).init_tag_data(unconstrained=unconstrained)
     df["water_column"] = "ERROR"
     df.loc[df["Depth [m] (est. or from tag)"] < 3, "water_column"] = "0-3m"
     df.loc[(3 <= df["Depth [m] (est. or from tag)"]) & (
@@ -178,11 +211,8 @@ def plot_no_shuffled_data(df):
     fig.show()
 
 
-def visualize_no_shuffled_data(with_night, short_nights, unconstrained=False, individual_days=False):
-    if unconstrained:
-        df = init_unconstrained_tag_data(short_nights=short_nights)
-    else:
-        df = init_standard_data(short_nights=short_nights)
+def visualize_no_shuffled_data(with_night, short_nights, unconstrained=False, individual_days=False, session=None):
+    df = get_session(session).init_tag_data(unconstrained=unconstrained, short_nights=short_nights)
     df["water_column"] = "ERROR"
     df.loc[df["Depth [m] (est. or from tag)"] < 3, "water_column"] = "0-3m"
     df.loc[(3 <= df["Depth [m] (est. or from tag)"]) & (
@@ -242,11 +272,8 @@ def plot_shuffled_data(df, with_night=False):
     fig.show()
 
 
-def visualize_time_shuffled_data(with_night, short_nights, unconstrained=False, individual_days=False):
-    if unconstrained:
-        df = init_unconstrained_tag_data(short_nights=short_nights)
-    else:
-        df = init_standard_data(short_nights=short_nights)
+def visualize_time_shuffled_data(with_night, short_nights, unconstrained=False, individual_days=False, session=None):
+    df = get_session(session).init_tag_data(unconstrained=unconstrained, short_nights=short_nights)
     df["water_column"] = "ERROR"
     df.loc[df["Depth [m] (est. or from tag)"] < 3, "water_column"] = "0-3m"
     df.loc[(3 <= df["Depth [m] (est. or from tag)"]) & (
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+from scipy.stats import chi2, norm
+
+from src.fish_telemetry_faa.statistics.parallel_resampling import map_blocks, permutation_p_value, \
+    repetition_blocks
+
+# Pooled samples from this size on are tested with the normal (chi-square for k groups) approximation under "auto"
+AUTO_APPROXIMATION_MIN_POOLED_SIZE = 100000
+# Upper bound of random keys held in memory at once per worker, whatever the sample sizes
+MAX_BATCH_ELEMENTS = 2 ** 22
+
+
+def _random_group_sums(pooled, group_sizes, rng, n_resamples):
+    """Sums of every group for n_resamples random partitions of pooled into groups of group_sizes."""
+    offsets = np.concatenate(([0], np.cumsum(group_sizes)[:-1]))
+    batch_size = max(1, MAX_BATCH_ELEMENTS // len(pooled))
+    sums = []
+    for start in range(0, n_resamples, batch_size):
+        rows = min(batch_size, n_resamples - start)
+        permuted = rng.permuted(np.broadcast_to(pooled, (rows, len(pooled))), axis=1)
+        sums.append(np.add.reduceat(permuted, offsets, axis=1))
+    return np.concatenate(sums)
+
+
+def _group_sums_block(pooled, group_sizes, seed_sequences, block_size, start, stop):
+    rng = np.random.default_rng(seed_sequences[start // block_size])
+    return _random_group_sums(pooled, group_sizes, rng, stop - start)
+
+
+def _statistic_from_sums(sums, group_sizes, total):
+    # Difference of the means for two groups, between-group sum of squares for more
+    group_sizes = np.asarray(group_sizes)
+    if len(group_sizes) == 2:
+        return sums[..., 0] / group_sizes[0] - sums[..., 1] / group_sizes[1]
+    return (sums ** 2 / group_sizes).sum(axis=-1) - total ** 2 / group_sizes.sum()
+
+
+def _approximate_p_value(observed, pooled, group_sizes, alternative):
+    n_pooled = len(pooled)
+    variance = pooled.var()
+    if len(group_sizes) == 2:
+        # Moments of a sample mean drawn without replacement from the pooled data
+        standard_error = np.sqrt(variance * n_pooled ** 2 / (group_sizes[0] * group_sizes[1] * (n_pooled - 1)))
+        z = observed / standard_error
+        p_values = {"less": norm.cdf(z), "greater": norm.sf(z), "two-sided": 2 * norm.sf(abs(z))}
+        return min(p_values[alternative], 1.0)
+    return chi2.sf(observed * (n_pooled - 1) / (n_pooled * variance), len(group_sizes) - 1)
+
+
+def mean_difference_permutation_tests(samples: dict, comparisons, n_resamples=10000, random_state=0, method="auto",
+                                      n_workers=None, block_size=1000) -> pd.DataFrame:
+    """Permutation tests of group means, all comparisons of one set of samples in one call.
+
+    comparisons are (group names, alternative) pairs. Two groups are compared by the difference of their means (first
+    minus second), more groups by the between-group sum of squares, which only has the "greater" alternative. Both only
+    depend on the group sums, so the resamples draw random subset sums in memory bounded batches instead of permuted
+    copies of the data. method is "monte_carlo", "normal" (chi-square for more than two groups) or "auto", which
+    approximates once the pooled sample reaches AUTO_APPROXIMATION_MIN_POOLED_SIZE. Every comparison gets its own
+    stream spawned from SeedSequence(random_state), the Monte Carlo p values follow scipy's permutation_test.
+    """
+    samples = {name: np.asarray(values, dtype=float) for name, values in samples.items()}
+    seed_sequences = np.random.SeedSequence(random_state).spawn(len(comparisons))
+    results = []
+    for (names, alternative), seed_sequence in zip(comparisons, seed_sequences):
+        if len(names) > 2 and alternative != "greater":
+            raise ValueError(f"Comparisons of more than two groups are one sided ('greater'), got {alternative}")
+        pooled = np.concatenate([samples[name] for name in names])
+        group_sizes = [len(samples[name]) for name in names]
+        observed = _statistic_from_sums(np.array([samples[name].sum() for name in names]), group_sizes, pooled.sum())
+        comparison_method = method
+        if method == "auto":
+            comparison_method = "normal" if len(pooled) >= AUTO_APPROXIMATION_MIN_POOLED_SIZE else "monte_carlo"
+        if comparison_method == "normal":
+            p_value = _approximate_p_value(observed, pooled, group_sizes, alternative)
+        elif comparison_method == "monte_carlo":
+            blocks = repetition_blocks(n_resamples, block_size)
+            sums = np.concatenate(map_blocks(_group_sums_block, blocks,
+                                             (pooled, group_sizes, seed_sequence.spawn(len(blocks)), block_size),
+                                             n_workers))
+            p_value = permutation_p_value(observed, _statistic_from_sums(sums, group_sizes, pooled.sum()),
+                                          alternative)
+        else:
+            raise ValueError(f"Unknown method {method}, choose one of ['auto', 'monte_carlo', 'normal']")
+        results.append({"comparison": " vs ".join(names), "alternative": alternative, "statistic": observed,
+                        "pvalue": p_value, "method": comparison_method})
+    return pd.DataFrame(results)
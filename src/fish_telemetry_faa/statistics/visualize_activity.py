@@ -3,57 +3,51 @@ import plotly.graph_objects as go
 from _plotly_utils.colors import n_colors
 from plotly.subplots import make_subplots
 import pandas as pd
-from src.fish_telemetry_faa.statistics.basic_activity_stats import identify_lasting_peaks
-from src.fish_telemetry_faa.utils.data_loader import init_unconstrained_tag_data, init_standard_data
-from src.fish_telemetry_faa.utils.sun_times import SunTimer
+from src.fish_telemetry_faa.statistics.basic_activity_stats import identify_lasting_peaks, first_faa_windows_until
+from src.fish_telemetry_faa.utils.binning import bin_statistics
+from src.fish_telemetry_faa.utils.data_session import get_session
 
 
-def viualize_activity():
-    df = init_standard_data(with_dates=False)
+def viualize_activity(session=None):
+    df = get_session(session).init_standard_data(with_dates=False)
     df = df.loc[df["is_activity"]]
     fig = px.line(df, x="Time (corrected)", y="activity", color="Name")
     fig.show()
 
 
-def viualize_binned_activity(minutes):
-    df = init_standard_data(with_dates=False)
+def viualize_binned_activity(minutes, session=None):
+    session = get_session(session)
+    df = session.init_standard_data(with_dates=False)
     df = df.loc[df["is_activity"]]
-    df_resampled = df.resample(f'{minutes}min', label='left', closed='left',
-                               offset=f"{0}min",
-                               on="Time (corrected)").mean()
+    df_resampled = session.binned_statistics(minutes, "init_standard_data", sensor="activity",
+                                             with_dates=False).xs("mean", axis=1, level=1)
     df_resampled["time_resampled"] = df_resampled.index
     df_resampled["Fish ID"] = "all fish"
     fig = px.line(df_resampled, x="time_resampled", y="activity", color="Fish ID")
     fig.update_traces(line=dict(width=10))
     # Add the individual binnings in there too
-    for name, df_partly in df.groupby("Name"):
-        df_partly_resampled = df_partly.resample(f'{minutes}min', label='left', closed='left',
-                                                 offset=f"{0}min",
-                                                 on="Time (corrected)").mean()
+    for name, df_partly in df.groupby("Name", observed=True):
+        df_partly_resampled = bin_statistics(df_partly, minutes, ["activity"], ["mean"]).xs("mean", axis=1, level=1)
         df_partly_resampled["time_resampled"] = df_partly_resampled.index
         df_partly_resampled = df_partly_resampled.dropna()
         fig.add_trace(go.Line(x=df_partly_resampled["time_resampled"], y=df_partly_resampled["activity"], name=name))
     fig.show()
 
 
-def visualize_activity_binned_mean_std(minutes, unconstrained=False, with_faa_bars=True, with_day_night_bars=True):
+def visualize_activity_binned_mean_std(minutes, unconstrained=False, with_faa_bars=True, with_day_night_bars=True,
+                                       session=None):
+    session = get_session(session)
     if unconstrained:
-        df = init_unconstrained_tag_data()
+        loader, loader_arguments = "init_unconstrained_tag_data", {}
     else:
-        df = init_standard_data(with_dates=False)
-    df_temp = df.loc[df["is_temperature"]]
-    df = df.loc[df["is_activity"]]
-    df_temp_mean = df_temp.resample(f'{minutes}min', label='left', closed='left',
-                                    offset=f"{0}min",
-                                    on="Time (corrected)").mean()
+        loader, loader_arguments = "init_standard_data", dict(with_dates=False)
+    # Any bin width is summed from the persisted one minute cube instead of the raw detections
+    cube = session.activity_cube(loader, **loader_arguments)
+    df_temp_mean = cube.binned(minutes, "temperature").xs("mean", axis=1, level=1)
     df_temp_mean["time_resampled"] = df_temp_mean.index
-    df_resampled_mean = df.resample(f'{minutes}min', label='left', closed='left',
-                                    offset=f"{0}min",
-                                    on="Time (corrected)").mean()
-    std = df.resample(f'{minutes}min', label='left', closed='left',
-                      offset=f"{0}min",
-                      on="Time (corrected)").std()
-    df_resampled_mean["std"] = std["activity"]
+    activity_bins = cube.binned(minutes, "activity")
+    df_resampled_mean = activity_bins.xs("mean", axis=1, level=1)
+    df_resampled_mean["std"] = activity_bins[("activity", "std")]
     df_resampled_mean["time_resampled"] = df_resampled_mean.index
 
     fig = make_subplots(specs=[[{"secondary_y": True}]])
@@ -94,21 +88,17 @@ def visualize_activity_binned_mean_std(minutes, unconstrained=False, with_faa_ba
     fig.update_yaxes(title_text="<b>Activity</b> in m/s²", secondary_y=False)
     fig.update_yaxes(title_text="<b>Temperature</b> in degC", secondary_y=True)
     if with_faa_bars:
-        faa_list = identify_lasting_peaks(unconstrained=unconstrained, minutes=minutes)
-        for dff in faa_list:
-            unpacked_df = dff[0]
-            # Always cut off at 8:00
-            unpacked_df = unpacked_df.loc[(unpacked_df["time"].dt.hour <= 7) | (
-                    (unpacked_df["time"].dt.hour <= 8) & (unpacked_df["time"].dt.minute == 0))]
-            fig.add_vrect(x0=unpacked_df["time"].dt.strftime('%Y-%m-%d %X')[0],
-                          x1=unpacked_df["time"].dt.strftime('%Y-%m-%d %X')[-1],
+        faa_df = identify_lasting_peaks(unconstrained=unconstrained, minutes=minutes, session=session)
+        # Always cut off at 8:00
+        for window in first_faa_windows_until(faa_df, hour=8).itertuples():
+            fig.add_vrect(x0=window.faa_start.strftime('%Y-%m-%d %X'),
+                          x1=window.faa_end.strftime('%Y-%m-%d %X'),
                           annotation_text="FAA", annotation_position="top left",
                           annotation=dict(font_size=20, font_family="Times New Roman"),
                           fillcolor="darkgreen", opacity=0.75, line_width=0)
     if with_day_night_bars:
         greys_dark = n_colors('rgb(0, 0, 0)', 'rgb(255, 255, 255)',  5, colortype='rgb')
-        sun_timer = SunTimer()
-        sun_times_df = sun_timer.get_all_sun_times_variations()
+        sun_times_df = session.sun_timer().get_all_sun_times_variations()
         fig.add_shape(type="rect",
                       x0='2021-05-26 00:00:00', y0=-0.1,
                       x1='2021-06-06 23:59:00', y1=0.1,
@@ -1,10 +1,10 @@
 import plotly.express as px
 
-from src.fish_telemetry_faa.utils.data_loader import init_standard_data
+from src.fish_telemetry_faa.utils.data_session import get_session
 
 
-def visualize_boxplots_day_night():
-    df = init_standard_data()
+def visualize_boxplots_day_night(session=None):
+    df = get_session(session).init_standard_data()
     df['fish_number'] = df['fish_number'].rank(method='dense')
     df["Time of day"] = "PLACEHOLDER"
     df.loc[df["time_of_day"] == "Day", "Time of day"] = "Day"
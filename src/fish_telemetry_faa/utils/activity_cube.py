@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+
+from src.fish_telemetry_faa.utils.binning import NANOSECONDS_PER_MINUTE, bin_numbers
+from src.fish_telemetry_faa.utils.data_cache import cache_key, constrained_sources, unconstrained_sources
+from src.fish_telemetry_faa.utils.project_constants import ProjectConstants
+
+CUBE_SENSORS = ["activity", "temperature"]
+CUBE_STATISTICS = ["count", "mean", "std"]
+# Finest resolution of the cube, every coarser bin width has to be a multiple of it
+CUBE_BASE_MINUTES = 1
+MINUTES_PER_DAY = 24 * 60
+CUBE_SOURCES = {
+    "init_standard_data": constrained_sources,
+    "init_unconstrained_tag_data": unconstrained_sources,
+}
+
+
+class ActivityCube:
+    """Count, sum and sum of squares of every sensor per fish and base bin, from which coarser bins are summed.
+
+    The arrays have the shape (fish, base bins), base bin 0 starts at the midnight before the first detection.
+    """
+
+    def __init__(self, fish, origin, base_minutes, sums):
+        self.fish = np.asarray(fish)
+        self.origin = int(origin)
+        self.base_minutes = int(base_minutes)
+        # sensor -> (count, sum, sum of squares)
+        self.sums = sums
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, base_minutes=CUBE_BASE_MINUTES, fish_column="fish_number"):
+        fish, fish_codes = np.unique(df[fish_column].to_numpy(), return_inverse=True)
+        bins, origin = bin_numbers(df["Time (corrected)"], base_minutes)
+        n_bins = bins.max() + 1 if len(bins) else 0
+        cells = fish_codes * n_bins + bins
+        n_cells = len(fish) * n_bins
+        sums = {}
+        for sensor in CUBE_SENSORS:
+            selected = df[f"is_{sensor}"].to_numpy()
+            values = df[sensor].to_numpy(dtype=float)[selected]
+            sensor_cells = cells[selected]
+            sums[sensor] = tuple(
+                np.bincount(sensor_cells, weights=weights, minlength=n_cells).reshape(len(fish), -1)
+                for weights in (None, values, values ** 2))
+        return cls(fish, origin, base_minutes, sums)
+
+    @classmethod
+    def load(cls, file):
+        with np.load(file) as arrays:
+            sums = {sensor: tuple(arrays[f"{sensor}_{part}"] for part in ("count", "sum", "sum_of_squares"))
+                    for sensor in CUBE_SENSORS}
+            return cls(arrays["fish"], arrays["origin"], arrays["base_minutes"], sums)
+
+    def save(self, file):
+        arrays = {f"{sensor}_{part}": array for sensor, parts in self.sums.items()
+                  for part, array in zip(("count", "sum", "sum_of_squares"), parts)}
+        np.savez(file, fish=self.fish, origin=self.origin, base_minutes=self.base_minutes, **arrays)
+
+    def binned(self, minutes, sensor="activity", fish=None) -> pd.DataFrame:
+        """count, mean and std of the sensor in bins of the given minutes, like bin_statistics of the raw detections.
+
+        fish optionally restricts the table to a subset of fish numbers.
+        """
+        if minutes % self.base_minutes:
+            raise ValueError(f"Bins of {minutes} minutes cannot be summed from {self.base_minutes} minute bins")
+        factor = minutes // self.base_minutes
+        rows = slice(None) if fish is None else np.isin(self.fish, fish)
+        count, total, total_of_squares = (array[rows].sum(axis=0) for array in self.sums[sensor])
+        occupied = np.flatnonzero(count)
+        columns = pd.MultiIndex.from_product([[sensor], CUBE_STATISTICS])
+        if len(occupied) == 0:
+            return pd.DataFrame(columns=columns, index=pd.DatetimeIndex([], name="Time (corrected)"))
+        # The bins are aligned to the first midnight of the selection and run from its first to its last occupied one,
+        # the last one may be cut short by the end of the cube
+        base_bins_per_day = MINUTES_PER_DAY // self.base_minutes
+        midnight = occupied[0] // base_bins_per_day * base_bins_per_day
+        first = midnight + (occupied[0] - midnight) // factor * factor
+        n_bins = (occupied[-1] - first) // factor + 1
+        coarse = []
+        for array in (count, total, total_of_squares):
+            padded = np.zeros(n_bins * factor)
+            selection = array[first:first + n_bins * factor]
+            padded[:len(selection)] = selection
+            coarse.append(padded.reshape(n_bins, factor).sum(axis=1))
+        count, total, total_of_squares = coarse
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = total / count
+            variance = (total_of_squares - total * mean) / (count - 1)
+        std = np.where(count > 1, np.sqrt(np.clip(variance, 0, None)), np.nan)
+        start = self.origin + first * self.base_minutes * NANOSECONDS_PER_MINUTE
+        index = pd.DatetimeIndex(start + np.arange(n_bins) * minutes * NANOSECONDS_PER_MINUTE, name="Time (corrected)")
+        return pd.DataFrame(np.column_stack((count, mean, std)), index=index, columns=columns).astype(
+            {(sensor, "count"): np.int64})
+
+
+def activity_cube_file(loader, base_minutes=CUBE_BASE_MINUTES, **loader_arguments):
+    # Keyed like the loader caches, by the arguments and a fingerprint of the sources and preparation code
+    key = cache_key(f"activity_cube_{loader}", CUBE_SOURCES[loader](), dict(base_minutes=base_minutes,
+                                                                           **loader_arguments))
+    return ProjectConstants.CACHE.joinpath(key).with_suffix(".npz")
+
+
+def load_activity_cube(load_frame, loader, base_minutes=CUBE_BASE_MINUTES, **loader_arguments) -> ActivityCube:
+    """The persisted cube of the loader's data, built from load_frame() and stored when it is missing or stale."""
+    file = activity_cube_file(loader, base_minutes, **loader_arguments)
+    if file.exists():
+        return ActivityCube.load(file)
+    cube = ActivityCube.from_frame(load_frame(), base_minutes)
+    ProjectConstants.CACHE.mkdir(parents=True, exist_ok=True)
+    for stale_file in ProjectConstants.CACHE.glob(f"{file.stem.rsplit('_', 1)[0]}_*"):
+        stale_file.unlink()
+    cube.save(file)
+    print(f"Stored activity cube of {len(cube.fish)} fish in {file.name}")
+    return cube
+
+
+if __name__ == "__main__":
+    from src.fish_telemetry_faa.utils.data_session import DataSession
+
+    session = DataSession()
+    for cube_loader in CUBE_SOURCES:
+        print(session.activity_cube(cube_loader).binned(20, "activity"))
@@ -0,0 +1,84 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.fish_telemetry_faa.utils.data_cache import load_cached_frame
+from src.fish_telemetry_faa.utils.data_loader import init_receiver_sensor_data, init_standard_data, \
+    init_unconstrained_tag_data, standard_data_cache_key, unconstrained_tag_data_cache_key
+from src.fish_telemetry_faa.utils.project_constants import ProjectConstants
+from src.fish_telemetry_faa.utils.sun_times import SunTimer, read_sun_times_csv
+from src.fish_telemetry_faa.utils.telemetry_schema import CONSTRAINED_TRANSMITTER_SCHEMA, RECEIVER_SENSOR_SCHEMA, \
+    UNCONSTRAINED_DETECTIONS_SCHEMA, read_telemetry_csv
+from src.fish_telemetry_faa.utils.transmitter_datasheets import TransmitterDataSheet
+
+# Reading is mostly waiting on the (possibly network mounted) disk, so the pool is larger than the CPU count
+DEFAULT_READ_WORKERS = 16
+
+
+async def _gather_in_pool(loop, executor, calls: dict) -> dict:
+    # Name -> (function, arguments), all run at once on the pool
+    results = await asyncio.gather(*(loop.run_in_executor(executor, function, *arguments)
+                                     for function, *arguments in calls.values()))
+    return dict(zip(calls.keys(), results))
+
+
+async def load_all_datasets(short_nights=True, use_cache=True, max_workers=DEFAULT_READ_WORKERS) -> dict:
+    """All datasets of the analysis, with the files read concurrently instead of one after another.
+
+    First the cached standard and unconstrained frames are looked up, and every file still needed (transmitter
+    files, TagDetections.csv, TBRSensorData.csv and the sun time tables) is read at once, so a cold start takes about
+    as long as the slowest file. The frames missing from the cache are then prepared from those reads, side by side,
+    and cached like the loaders do. Returns a dict with the "standard", "unconstrained" and "receiver" frames and the
+    "sun_timer".
+    """
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        cached = {}
+        if use_cache:
+            cached = await _gather_in_pool(loop, executor, {
+                "standard": (load_cached_frame, standard_data_cache_key(short_nights)),
+                "unconstrained": (load_cached_frame, unconstrained_tag_data_cache_key(short_nights))})
+        sun_time_files = sorted(ProjectConstants.SUN_TIMES.glob("*.csv"))
+        # The transmitter files keep the order of the directory listing, like TransmitterDataSheet adds them
+        transmitter_files = list(ProjectConstants.CONSTRAINED_TRANSMITTER_DATA.glob("*.csv"))
+        reads = {("receiver", None): (read_telemetry_csv, ProjectConstants.RECEIVERS_SENSOR_DATA,
+                                      RECEIVER_SENSOR_SCHEMA)}
+        reads.update({("sun_times", file): (read_sun_times_csv, file) for file in sun_time_files})
+        if cached.get("standard") is None:
+            reads.update({("transmitter", file): (read_telemetry_csv, file, CONSTRAINED_TRANSMITTER_SCHEMA)
+                          for file in transmitter_files})
+        if cached.get("unconstrained") is None:
+            reads[("detections", None)] = (read_telemetry_csv, ProjectConstants.UNCONSTRAINED_RECEIVER_DATA,
+                                           UNCONSTRAINED_DETECTIONS_SCHEMA)
+        read = await _gather_in_pool(loop, executor, reads)
+        print(f"Read {len(reads)} files concurrently in {time.perf_counter() - start:.2f}s")
+
+        sun_timer = SunTimer({file: table for (kind, file), table in read.items() if kind == "sun_times"})
+        # Preparing the frames is CPU bound, but pandas releases the GIL for much of it
+        preparations = {"receiver": (init_receiver_sensor_data, read[("receiver", None)])}
+        if cached.get("standard") is None:
+            data_sheet = TransmitterDataSheet(empty=True)
+            for file in transmitter_files:
+                data_sheet.add_read_csv_file(file.stem, read[("transmitter", file)])
+            preparations["standard"] = (lambda: init_standard_data(short_nights, use_cache=use_cache,
+                                                                   data_sheet=data_sheet, sun_timer=sun_timer),)
+        if cached.get("unconstrained") is None:
+            preparations["unconstrained"] = (lambda: init_unconstrained_tag_data(
+                short_nights, use_cache=use_cache, detections=read[("detections", None)], sun_timer=sun_timer),)
+        datasets = await _gather_in_pool(loop, executor, preparations)
+    datasets.update({name: frame for name, frame in cached.items() if frame is not None})
+    datasets["sun_timer"] = sun_timer
+    print(f"Loaded all datasets in {time.perf_counter() - start:.2f}s")
+    return datasets
+
+
+def load_all_datasets_blocking(short_nights=True, use_cache=True, max_workers=DEFAULT_READ_WORKERS) -> dict:
+    """load_all_datasets for code that does not run an event loop."""
+    return asyncio.run(load_all_datasets(short_nights, use_cache, max_workers))
+
+
+if __name__ == "__main__":
+    all_datasets = load_all_datasets_blocking()
+    for dataset_name in ["standard", "unconstrained", "receiver"]:
+        print(f"{dataset_name}: {len(all_datasets[dataset_name])} rows")
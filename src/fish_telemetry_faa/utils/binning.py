@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+BIN_STATISTICS = ["count", "mean", "std", "min", "max", "median"]
+BINNED_COLUMNS = ["activity", "temperature", "Depth [m] (est. or from tag)"]
+NANOSECONDS_PER_MINUTE = 60 * 10 ** 9
+
+
+def bin_numbers(times, minutes: int):
+    """Bin of every timestamp and the start of bin 0, the midnight before the first timestamp.
+
+    These are the bins of resample(f'{minutes}min', label='left', closed='left', offset="0min"), whose origin is the
+    start of the first day.
+    """
+    nanoseconds = np.asarray(times, dtype="datetime64[ns]").view(np.int64)
+    origin = nanoseconds.min() // (24 * 60 * NANOSECONDS_PER_MINUTE) * (24 * 60 * NANOSECONDS_PER_MINUTE)
+    return (nanoseconds - origin) // (minutes * NANOSECONDS_PER_MINUTE), origin
+
+
+def bin_statistics(df: pd.DataFrame, minutes: int, columns=None, statistics=None,
+                   time_column="Time (corrected)") -> pd.DataFrame:
+    """All requested statistics of the columns per bin, in one groupby over the integer bin numbers.
+
+    The table has a (column, statistic) column index and one row per bin from the first to the last occupied one,
+    labelled by the bin start, like resample would give. Empty bins have a count of 0 and NaN otherwise.
+    """
+    columns = [column for column in (columns or BINNED_COLUMNS) if column in df.columns]
+    statistics = statistics or BIN_STATISTICS
+    if len(df) == 0:
+        return pd.DataFrame(columns=pd.MultiIndex.from_product([columns, statistics]),
+                            index=pd.DatetimeIndex([], name=time_column))
+    bins, origin = bin_numbers(df[time_column], minutes)
+    table = df[columns].groupby(bins).agg(statistics)
+    all_bins = np.arange(bins.min(), bins.max() + 1)
+    table = table.reindex(all_bins)
+    for column in columns:
+        if "count" in statistics:
+            table[(column, "count")] = table[(column, "count")].fillna(0).astype(np.int64)
+    table.index = pd.DatetimeIndex(origin + all_bins * minutes * NANOSECONDS_PER_MINUTE, name=time_column)
+    return table
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from src.fish_telemetry_faa.utils.data_session import get_session
+from src.fish_telemetry_faa.utils.sun_times import TWILIGHT_BOUNDARIES
+
+# Repeated labels, stored once per category instead of once per detection
+CATEGORICAL_COLUMNS = ["Name", "Protocol", "time_of_day", "time_of_day_interval", "water_column", "type"]
+# Raw receiver values with a few significant digits, single precision holds them exactly enough
+FLOAT32_COLUMNS = ["SNR [dB]", "SNR", "HDOP", "Data2 (DS256 only)", "Data2"]
+
+
+def _seconds_of_day(times: pd.Series) -> np.ndarray:
+    # datetime.time objects (or NaN) to seconds since midnight
+    return pd.to_timedelta(times.astype(str), errors="coerce").dt.total_seconds().to_numpy(dtype=np.float32)
+
+
+def compact_telemetry_frame(df: pd.DataFrame):
+    """Prepared frame with categoricals, downcast numerics and seconds of the day instead of time objects.
+
+    The eight sunrise/sunset columns are moved to a table with one row per day (seconds of the day, indexed by
+    temp_id), which join_sun_times broadcasts to the detections on demand. temp_id becomes a categorical of the days.
+    Returns the compact frame and the sun times per day (None when the frame has no temp_id).
+    """
+    sun_columns = [column for column in TWILIGHT_BOUNDARIES if column in df.columns]
+    compact = df.drop(columns=sun_columns + [column for column in ["time"] if column in df.columns])
+    sun_times = None
+    if "temp_id" in df.columns:
+        per_day = df[["temp_id"] + sun_columns].drop_duplicates("temp_id").set_index("temp_id").sort_index()
+        sun_times = pd.DataFrame({column: _seconds_of_day(per_day[column]) for column in sun_columns},
+                                 index=per_day.index)
+        compact["temp_id"] = pd.Categorical(df["temp_id"], categories=sun_times.index)
+    if "time" in df.columns:
+        compact["seconds_of_day"] = _seconds_of_day(df["time"])
+    for column in compact.columns:
+        if column in CATEGORICAL_COLUMNS:
+            compact[column] = compact[column].astype("category")
+        elif column in FLOAT32_COLUMNS:
+            compact[column] = compact[column].astype(np.float32)
+        elif pd.api.types.is_integer_dtype(compact[column]) and not pd.api.types.is_bool_dtype(compact[column]):
+            compact[column] = pd.to_numeric(compact[column], downcast="integer")
+    return compact, sun_times
+
+
+def join_sun_times(compact: pd.DataFrame, sun_times: pd.DataFrame, columns=None) -> pd.DataFrame:
+    """The sun times (seconds of the day) of every detection's day, only for the given columns."""
+    day_codes = compact["temp_id"].cat.codes.to_numpy()
+    return pd.DataFrame({column: pd.api.extensions.take(sun_times[column].to_numpy(), day_codes, allow_fill=True)
+                         for column in (columns or sun_times.columns)}, index=compact.index)
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """Bytes per detection of every column (and the index) before and after compacting, with the totals."""
+    report = pd.DataFrame({"before": before.memory_usage(deep=True) / max(len(before), 1),
+                           "after": after.memory_usage(deep=True) / max(len(after), 1)})
+    report.loc["Total"] = report.sum()
+    print(f"{report.loc['Total', 'before']:.1f} bytes per detection before, {report.loc['Total', 'after']:.1f} after")
+    return report
+
+
+def compact_tag_data(unconstrained: bool = False, session=None):
+    df = get_session(session).init_tag_data(unconstrained=unconstrained)
+    compact, sun_times = compact_telemetry_frame(df)
+    print(memory_report(df, compact).to_string(float_format="{:.1f}".format))
+    return compact, sun_times
+
+
+if __name__ == "__main__":
+    compact_tag_data(unconstrained=False)
+    compact_tag_data(unconstrained=True)
@@ -0,0 +1,93 @@
+import hashlib
+import json
+from pathlib import Path
+
+import pandas as pd
+
+from src.fish_telemetry_faa.utils.project_constants import ProjectConstants
+from src.fish_telemetry_faa.utils.telemetry_schema import PYARROW_AVAILABLE
+
+# Without pyarrow the frames are pickled, which is still far faster than re-running the preparation
+CACHE_SUFFIX = ".parquet" if PYARROW_AVAILABLE else ".pkl"
+
+# The preparation code itself is part of the key, so editing a loader invalidates the cached frames
+PIPELINE_SOURCES = sorted(Path(__file__).parent.glob("*.py"))
+INDEX_LEVEL_PREFIX = "__index_level_"
+
+
+def constrained_sources():
+    return sorted(ProjectConstants.CONSTRAINED_TRANSMITTER_DATA.glob("*.csv")) + sorted(
+        ProjectConstants.SUN_TIMES.glob("*.csv"))
+
+
+def unconstrained_sources():
+    return [ProjectConstants.UNCONSTRAINED_RECEIVER_DATA] + sorted(ProjectConstants.SUN_TIMES.glob("*.csv"))
+
+
+def _file_fingerprint(file: Path):
+    stat = file.stat()
+    return [str(file), stat.st_mtime_ns, stat.st_size]
+
+
+def _digest(content) -> str:
+    return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def cache_key(name: str, source_files, loader_arguments: dict) -> str:
+    """Hash of the loader arguments, followed by a hash of the source files (path, mtime, size) and loader code."""
+    fingerprint = {
+        "sources": [_file_fingerprint(file) for file in source_files],
+        "pipeline": [_file_fingerprint(file) for file in PIPELINE_SOURCES],
+    }
+    return f"{name}_{_digest(loader_arguments)}_{_digest(fingerprint)}"
+
+
+def _cache_file(key: str) -> Path:
+    return ProjectConstants.CACHE.joinpath(key).with_suffix(CACHE_SUFFIX)
+
+
+def _to_columnar(df: pd.DataFrame) -> pd.DataFrame:
+    # Index levels share their names with columns (set_index(..., drop=False)), so store them under own names
+    flat = df.reset_index(drop=True)
+    for level in range(df.index.nlevels):
+        flat[f"{INDEX_LEVEL_PREFIX}{level}__"] = df.index.get_level_values(level)
+    return flat
+
+
+def _from_columnar(flat: pd.DataFrame, index_names) -> pd.DataFrame:
+    index_columns = [f"{INDEX_LEVEL_PREFIX}{level}__" for level in range(len(index_names))]
+    df = flat.set_index(index_columns)
+    df.index.names = index_names
+    return df
+
+
+def load_cached_frame(key: str):
+    file = _cache_file(key)
+    if not file.exists():
+        return None
+    if CACHE_SUFFIX == ".parquet":
+        meta = json.loads(file.with_suffix(".json").read_text())
+        df = _from_columnar(pd.read_parquet(file), meta["index_names"])
+    else:
+        df = pd.read_pickle(file)
+    print(f"Loaded {len(df)} signals from cache {file.name}")
+    return df
+
+
+def store_cached_frame(key: str, df: pd.DataFrame):
+    ProjectConstants.CACHE.mkdir(parents=True, exist_ok=True)
+    # Frames built from older sources for the same loader arguments are stale now
+    arguments_prefix = key.rsplit("_", 1)[0]
+    for stale_file in ProjectConstants.CACHE.glob(f"{arguments_prefix}_*"):
+        stale_file.unlink()
+    file = _cache_file(key)
+    if CACHE_SUFFIX == ".parquet":
+        _to_columnar(df).to_parquet(file)
+        file.with_suffix(".json").write_text(json.dumps({"index_names": list(df.index.names)}))
+    else:
+        df.to_pickle(file)
+
+
+def clear_cache():
+    for file in ProjectConstants.CACHE.glob("*"):
+        file.unlink()
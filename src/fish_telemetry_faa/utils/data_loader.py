@@ -1,12 +1,15 @@
 import pandas
 import pandas as pd
 
+from src.fish_telemetry_faa.utils.data_cache import cache_key, constrained_sources, load_cached_frame, \
+    store_cached_frame, unconstrained_sources
 from src.fish_telemetry_faa.utils.filter_util import cut_by_start_date, filter_by_snr, cut_by_end_date, filter_by_hdop
 from src.fish_telemetry_faa.utils.pinpoint_data_converter import convert_data2, exclude_all_outliers
 from src.fish_telemetry_faa.utils.transmitter_datasheets import TransmitterDataSheet, \
     UnconstrainedTransmitterDataSheet
 from src.fish_telemetry_faa.utils.project_constants import ProjectConstants
 from src.fish_telemetry_faa.utils.sun_times import correlate_sun_timer_with_fish_positions, add_time_of_day_intervals
+from src.fish_telemetry_faa.utils.telemetry_schema import RECEIVER_SENSOR_SCHEMA, read_telemetry_csv
 
 
 def add_water_columns(df):
@@ -19,11 +22,15 @@ def add_water_columns(df):
 
 
 def init_data(files, all_fish, start_date, end_date, hdop_slider_values, snr_slider_values,
-              with_dates=True, short_nights=True) -> pandas.DataFrame:
-    if all_fish:
-        data_sheet = TransmitterDataSheet(empty=False)
-    else:
-        data_sheet = TransmitterDataSheet(empty=True)
+              with_dates=True, short_nights=True, chunksize=None, data_sheet=None, sun_timer=None) -> pandas.DataFrame:
+    """With a data_sheet (and sun_timer) the already read transmitter files (and sun times) are prepared."""
+    # When streaming the files in chunks, the SNR/HDOP filters are already applied to every chunk
+    data_sheet_arguments = dict(chunksize=chunksize, snr_slider_values=snr_slider_values,
+                                hdop_slider_values=hdop_slider_values) if chunksize else {}
+    if data_sheet is None and all_fish:
+        data_sheet = TransmitterDataSheet(empty=False, **data_sheet_arguments)
+    elif data_sheet is None:
+        data_sheet = TransmitterDataSheet(empty=True, **data_sheet_arguments)
         try:
             print(len(files))
             print(files)
@@ -50,7 +57,7 @@ def init_data(files, all_fish, start_date, end_date, hdop_slider_values, snr_sli
         print(f"Number of signals in the experiment window: {len(df)}")
     df = filter_by_snr(df, snr_slider_values[0], snr_slider_values[1])
     df = filter_by_hdop(df, hdop_slider_values[0], hdop_slider_values[1])
-    df = correlate_sun_timer_with_fish_positions(df)
+    df = correlate_sun_timer_with_fish_positions(df, sun_timer)
     df = convert_data2(df)
     df = exclude_all_outliers(df)
     df = add_time_of_day_intervals(df, short_nights=short_nights)
@@ -58,22 +65,39 @@ def init_data(files, all_fish, start_date, end_date, hdop_slider_values, snr_sli
     return df
 
 
-def init_standard_data(short_nights=True, with_dates=True):
-    df = init_data([], all_fish=True, start_date="2021-05-26", end_date="2021-06-06", hdop_slider_values=[0, 1.2],
-                   snr_slider_values=[20, 50], with_dates=with_dates, short_nights=short_nights)
+def standard_data_cache_key(short_nights=True, with_dates=True, chunksize=None):
+    return cache_key("standard", constrained_sources(), _standard_loader_arguments(short_nights, with_dates, chunksize))
+
+
+def _standard_loader_arguments(short_nights, with_dates, chunksize):
+    return dict(start_date="2021-05-26", end_date="2021-06-06", hdop_slider_values=[0, 1.2],
+                snr_slider_values=[20, 50], with_dates=with_dates, short_nights=short_nights, chunksize=chunksize)
+
+
+def init_standard_data(short_nights=True, with_dates=True, use_cache=True, chunksize=None, data_sheet=None,
+                       sun_timer=None):
+    loader_arguments = _standard_loader_arguments(short_nights, with_dates, chunksize)
+    key = standard_data_cache_key(short_nights, with_dates, chunksize)
+    if use_cache:
+        df = load_cached_frame(key)
+        if df is not None:
+            return df
+    df = init_data([], all_fish=True, data_sheet=data_sheet, sun_timer=sun_timer, **loader_arguments)
     df['hour'] = df.index.get_level_values(1).hour
     df['minute'] = df.index.get_level_values(1).minute
     df['second'] = df.index.get_level_values(1).second
     df['time_numeric'] = df['hour'] + df['minute'] / 60 + df['second'] / 3600
+    if use_cache:
+        store_cached_frame(key, df)
     return df
 
 
-def init_unconstrained_data(snr_slider_values, short_nights=True) -> pandas.DataFrame:
-    data_sheet = UnconstrainedTransmitterDataSheet()
+def init_unconstrained_data(snr_slider_values, short_nights=True, detections=None, sun_timer=None) -> pandas.DataFrame:
+    data_sheet = UnconstrainedTransmitterDataSheet(detections)
     df = data_sheet.get_unconstrained_transmitter_data()
     df = filter_by_snr(df, snr_slider_values[0], snr_slider_values[1])
     # No HDOP filter because no positioning
-    df = correlate_sun_timer_with_fish_positions(df)
+    df = correlate_sun_timer_with_fish_positions(df, sun_timer)
     df = convert_data2(df, unconstrained=True)
     df = exclude_all_outliers(df, unconstrained=True)
     df = add_time_of_day_intervals(df, drop_sun_times=True, short_nights=short_nights)
@@ -81,22 +105,36 @@ def init_unconstrained_data(snr_slider_values, short_nights=True) -> pandas.Data
     return df
 
 
-def init_unconstrained_tag_data(short_nights=True):
-    df = init_unconstrained_data(snr_slider_values=[20, 50], short_nights=short_nights)
+def unconstrained_tag_data_cache_key(short_nights=True):
+    return cache_key("unconstrained", unconstrained_sources(), dict(snr_slider_values=[20, 50],
+                                                                    short_nights=short_nights))
+
+
+def init_unconstrained_tag_data(short_nights=True, use_cache=True, detections=None, sun_timer=None):
+    loader_arguments = dict(snr_slider_values=[20, 50], short_nights=short_nights)
+    key = unconstrained_tag_data_cache_key(short_nights)
+    if use_cache:
+        df = load_cached_frame(key)
+        if df is not None:
+            return df
+    df = init_unconstrained_data(detections=detections, sun_timer=sun_timer, **loader_arguments)
     df['hour'] = df.index.get_level_values(2).hour
     df['minute'] = df.index.get_level_values(2).minute
     df['second'] = df.index.get_level_values(2).second
     df['time_numeric'] = df['hour'] + df['minute'] / 60 + df['second'] / 3600
+    if use_cache:
+        store_cached_frame(key, df)
     return df
 
 
-def init_receiver_sensor_data():
-    df = pd.read_csv(ProjectConstants.RECEIVERS_SENSOR_DATA, header=0, encoding="utf-8",
-                     skipinitialspace=True, delimiter=";")
-    df["Time (corrected)"] = pd.to_datetime(df["Date and Time (UTC)"]) + pd.DateOffset(hours=3)
+def init_receiver_sensor_data(sensor_data=None):
+    df = sensor_data
+    if df is None:
+        df = read_telemetry_csv(ProjectConstants.RECEIVERS_SENSOR_DATA, RECEIVER_SENSOR_SCHEMA)
+    df["Time (corrected)"] = df["Date and Time (UTC)"] + pd.DateOffset(hours=3)
     df = df.drop(columns="Date and Time (UTC)")
     df = df.set_index(["Time (corrected)", "Receiver"], drop=False)
-    df["temperature"] = df["Temperature [degC]"].str.replace(",", ".").astype(float)
+    df["temperature"] = df["Temperature [degC]"]
     return df
 
 
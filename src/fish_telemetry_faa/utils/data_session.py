@@ -0,0 +1,87 @@
+import pandas as pd
+
+from src.fish_telemetry_faa.utils.activity_cube import ActivityCube, load_activity_cube
+from src.fish_telemetry_faa.utils.binning import bin_statistics
+from src.fish_telemetry_faa.utils.data_loader import init_standard_data, init_unconstrained_tag_data, \
+    init_receiver_sensor_data
+from src.fish_telemetry_faa.utils.sun_times import SunTimer, get_sun_timer
+
+
+def _enable_copy_on_write() -> bool:
+    """Switch on copy-on-write where pandas implements it completely (2.0 on, default from 3.0), returns if it is on.
+
+    The copy-on-write mode of pandas 1.5 is incomplete (e.g. df["a"] += 1 on a shallow copy still writes through to the
+    original), so it is left off there.
+    """
+    major_version = int(pd.__version__.split(".")[0])
+    if major_version == 2:
+        pd.set_option("mode.copy_on_write", True)
+    return major_version >= 2
+
+
+class DataSession:
+    """Memoizes the data loaders by their arguments, so one run parses every source exactly once.
+
+    The frames are handed out as copies, callers may add or overwrite columns without touching the shared frame.
+    From pandas 2.0 the session switches on copy-on-write for the process and hands out shallow copies, which cost
+    next to nothing until a caller writes to a column. With older pandas every access makes a deep copy of the whole
+    frame, so fetch a frame once per function instead of inside loops.
+    """
+
+    def __init__(self):
+        self._copy_on_write = _enable_copy_on_write()
+        self._frames = {}
+        self._binned = {}
+        self._cubes = {}
+
+    def _memoized(self, loader, **loader_arguments):
+        key = (loader.__name__, tuple(sorted(loader_arguments.items())))
+        if key not in self._frames:
+            self._frames[key] = loader(**loader_arguments)
+        # With copy-on-write a shallow copy only duplicates the columns a caller writes to
+        return self._frames[key].copy(deep=not self._copy_on_write)
+
+    def init_standard_data(self, short_nights=True, with_dates=True):
+        return self._memoized(init_standard_data, short_nights=short_nights, with_dates=with_dates)
+
+    def init_unconstrained_tag_data(self, short_nights=True):
+        return self._memoized(init_unconstrained_tag_data, short_nights=short_nights)
+
+    def init_tag_data(self, unconstrained=False, short_nights=True):
+        if unconstrained:
+            return self.init_unconstrained_tag_data(short_nights=short_nights)
+        return self.init_standard_data(short_nights=short_nights)
+
+    def init_receiver_sensor_data(self):
+        return self._memoized(init_receiver_sensor_data)
+
+    def binned_statistics(self, minutes, loader="init_standard_data", sensor=None, **loader_arguments):
+        """bin_statistics of a loader's frame, optionally only of the "activity" or "temperature" detections.
+
+        The tables are cached per loader arguments, sensor and minutes, so all statistics of one binning share a pass.
+        """
+        key = (loader, tuple(sorted(loader_arguments.items())), sensor, minutes)
+        if key not in self._binned:
+            df = getattr(self, loader)(**loader_arguments)
+            if sensor is not None:
+                df = df.loc[df[f"is_{sensor}"]]
+            self._binned[key] = bin_statistics(df, minutes)
+        return self._binned[key].copy()
+
+    def activity_cube(self, loader="init_standard_data", **loader_arguments) -> ActivityCube:
+        """The ActivityCube of a loader's frame, read from the cache directory and only built when it is missing."""
+        key = (loader, tuple(sorted(loader_arguments.items())))
+        if key not in self._cubes:
+            self._cubes[key] = load_activity_cube(lambda: getattr(self, loader)(**loader_arguments), loader,
+                                                  **loader_arguments)
+        return self._cubes[key]
+
+    def sun_timer(self) -> SunTimer:
+        return get_sun_timer()
+
+
+def get_session(session=None) -> DataSession:
+    """Use the given session, or a fresh one when a function is called on its own."""
+    if session is None:
+        return DataSession()
+    return session
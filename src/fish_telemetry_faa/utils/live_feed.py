@@ -0,0 +1,250 @@
+import io
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from src.fish_telemetry_faa.utils.data_loader import add_water_columns
+from src.fish_telemetry_faa.utils.filter_util import filter_by_hdop, filter_by_snr
+from src.fish_telemetry_faa.utils.pinpoint_data_converter import convert_data2
+from src.fish_telemetry_faa.utils.project_constants import ProjectConstants
+from src.fish_telemetry_faa.utils.sun_times import SunTimer, add_time_of_day_intervals, \
+    correlate_sun_timer_with_fish_positions, get_sun_timer
+from src.fish_telemetry_faa.utils.telemetry_schema import CONSTRAINED_TRANSMITTER_SCHEMA, RECEIVER_SENSOR_SCHEMA, \
+    UNCONSTRAINED_DETECTIONS_SCHEMA, read_telemetry_csv
+from src.fish_telemetry_faa.utils.transmitter_datasheets import UnconstrainedTransmitterDataSheet, \
+    concat_keeping_categories, fish_numbers_of_names
+
+LIVE_SOURCES = {
+    "unconstrained": UNCONSTRAINED_DETECTIONS_SCHEMA,
+    "constrained": CONSTRAINED_TRANSMITTER_SCHEMA,
+    "receiver": RECEIVER_SENSOR_SCHEMA,
+}
+
+
+class TelemetryTailer:
+    """Follows CSV files that receivers keep appending to and parses only the lines written since the last read.
+
+    path is a file or a directory, in which every file matching pattern is followed, so rotated files are picked up
+    as they appear. A line is only read once it is complete (ends with a newline). A file that shrank was rotated or
+    truncated and is read from its start again.
+    """
+
+    def __init__(self, path, schema, pattern="*.csv"):
+        self.path = Path(path)
+        self.schema = schema
+        self.pattern = pattern
+        self._offsets = {}
+        self._headers = {}
+
+    def files(self):
+        if self.path.is_dir():
+            return sorted(self.path.glob(self.pattern))
+        return [self.path] if self.path.exists() else []
+
+    def _new_lines(self, file: Path):
+        offset = self._offsets.get(file, 0)
+        if file.stat().st_size < offset:
+            offset = 0
+        with open(file, "rb") as stream:
+            stream.seek(offset)
+            content = stream.read()
+        complete = content[:content.rfind(b"\n") + 1]
+        self._offsets[file] = offset + len(complete)
+        text = complete.decode("utf-8")
+        if offset == 0:
+            header, _, text = text.partition("\n")
+            if not header:
+                return None
+            self._headers[file] = header + "\n"
+        return text
+
+    def read_new(self) -> dict:
+        """Parsed new rows per file, only for the files that have some."""
+        batches = {}
+        for file in self.files():
+            text = self._new_lines(file)
+            if text:
+                batches[file] = read_telemetry_csv(io.StringIO(self._headers[file] + text), self.schema, engine="c")
+        return batches
+
+
+def add_time_numeric(df: pd.DataFrame, time_column="Time (corrected)") -> pd.DataFrame:
+    times = df[time_column].dt
+    df['hour'] = times.hour
+    df['minute'] = times.minute
+    df['second'] = times.second
+    df['time_numeric'] = df['hour'] + df['minute'] / 60 + df['second'] / 3600
+    return df
+
+
+class LiveTelemetryFeed:
+    """Streaming counterpart of the data loaders: every poll prepares the new detections and appends them to a window.
+
+    kind is one of LIVE_SOURCES. The new rows of a poll run through the filters, convert_data2 and the time of day
+    tagging of the loaders and are kept for window (a Timedelta string) back from the latest detection. The z-score
+    outlier exclusion needs the whole population and is left out. Callables added with subscribe are called with the
+    prepared batch and the window after every poll that brought new rows, so downstream statistics can update
+    incrementally instead of reloading.
+    """
+
+    def __init__(self, path, kind="unconstrained", window="2D", snr_slider_values=(20, 50),
+                 hdop_slider_values=(0, 1.2), short_nights=True, sun_timer: SunTimer = None, pattern="*.csv"):
+        if kind not in LIVE_SOURCES:
+            raise ValueError(f"Unknown live source {kind}, choose one of {list(LIVE_SOURCES)}")
+        self.kind = kind
+        self.tailer = TelemetryTailer(path, LIVE_SOURCES[kind], pattern=pattern)
+        self.window = pd.Timedelta(window)
+        self.snr_slider_values = snr_slider_values
+        self.hdop_slider_values = hdop_slider_values
+        self.short_nights = short_nights
+        self.sun_timer = sun_timer
+        self._sun_time_days = None
+        self.frame = None
+        self._tag_names = set()
+        self._fish_numbers = {}
+        self._tag_names_grew = False
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+    def _within_sun_times(self, df):
+        # The time of day tagging needs the sun times of the day, detections of other days are dropped
+        if self._sun_time_days is None:
+            sun_time_sheet = self.sun_timer.load_unified_sun_time_sheet_with_id()
+            self._sun_time_days = pd.DatetimeIndex(sun_time_sheet.index).normalize()
+        covered = df["Time (corrected)"].dt.normalize().isin(self._sun_time_days)
+        if not covered.all():
+            print(f"{(~covered).sum()} detections outside the days of the sun times dropped")
+        return df.loc[covered.to_numpy()]
+
+    def _prepare_unconstrained(self, batches):
+        df = UnconstrainedTransmitterDataSheet(pd.concat(batches.values())).get_unconstrained_transmitter_data()
+        df = filter_by_snr(df, self.snr_slider_values[0], self.snr_slider_values[1])
+        df = self._within_sun_times(df)
+        df = correlate_sun_timer_with_fish_positions(df, self.sun_timer)
+        df = convert_data2(df, unconstrained=True)
+        df = add_time_of_day_intervals(df, drop_sun_times=True, short_nights=self.short_nights)
+        return add_time_numeric(add_water_columns(df))
+
+    def _prepare_constrained(self, batches):
+        frames = []
+        for df in batches.values():
+            time_corrected = df["Time (UTC)"] + pd.DateOffset(hours=3)  # Crete is +3 towards UTC!
+            df["time_index"] = time_corrected
+            df["Time (corrected)"] = time_corrected
+            df["datum"] = time_corrected
+            frames.append(df.set_index(pd.DatetimeIndex(time_corrected.values)))
+        df = concat_keeping_categories(frames, keys=[file.stem for file in batches], names=["fish_name", "dates"])
+        # The pairs are taken from every tag seen so far, a batch may hold only one tag of a fish
+        new_tag_names = set(df["Name"].astype(str)) - self._tag_names
+        if new_tag_names:
+            self._tag_names.update(new_tag_names)
+            self._fish_numbers = fish_numbers_of_names(self._tag_names)
+            self._tag_names_grew = True
+        df["fish_number"] = df["Name"].astype(str).map(self._fish_numbers).astype("int64")
+        df = filter_by_snr(df, self.snr_slider_values[0], self.snr_slider_values[1])
+        df = filter_by_hdop(df, self.hdop_slider_values[0], self.hdop_slider_values[1])
+        df = self._within_sun_times(df)
+        df = correlate_sun_timer_with_fish_positions(df, self.sun_timer)
+        df = convert_data2(df)
+        df = add_time_of_day_intervals(df, short_nights=self.short_nights)
+        return add_time_numeric(add_water_columns(df))
+
+    def _prepare_receiver(self, batches):
+        df = pd.concat(batches.values())
+        df["Time (corrected)"] = df["Date and Time (UTC)"] + pd.DateOffset(hours=3)
+        df = df.drop(columns="Date and Time (UTC)")
+        df = df.set_index(["Time (corrected)", "Receiver"], drop=False)
+        df["temperature"] = df["Temperature [degC]"]
+        return df
+
+    def poll(self):
+        """Read and prepare the new rows, returns the prepared batch (None without new rows)."""
+        batches = self.tailer.read_new()
+        if not batches:
+            return None
+        if self.sun_timer is None and self.kind != "receiver":
+            self.sun_timer = get_sun_timer()
+        batch = getattr(self, f"_prepare_{self.kind}")(batches)
+        if len(batch) == 0:
+            return None
+        self.frame = batch if self.frame is None else pd.concat([self.frame, batch])
+        if self._tag_names_grew:
+            # A new partner tag can change the fish number of the tags already in the window
+            self.frame = self.frame.assign(
+                fish_number=self.frame["Name"].astype(str).map(self._fish_numbers).astype("int64"))
+            self._tag_names_grew = False
+        if len(self.frame):
+            self.frame = self.frame.loc[self.frame["Time (corrected)"] >= self.frame["Time (corrected)"].max()
+                                        - self.window]
+        for callback in self._subscribers:
+            callback(batch, self.frame)
+        return batch
+
+    def follow(self, poll_seconds=1.0, max_polls=None):
+        """Poll until max_polls polls (forever with None), sleeping poll_seconds between polls."""
+        polls = 0
+        while max_polls is None or polls < max_polls:
+            self.poll()
+            polls += 1
+            time.sleep(poll_seconds)
+
+
+class ReceiverSimulator:
+    """Replays a recorded export into target, a few lines at a time, like a receiver appending its detections.
+
+    With rotate_every the lines go to numbered files in the target directory, a new one after that many lines.
+    """
+
+    def __init__(self, source, target, rotate_every=None):
+        lines = Path(source).read_text(encoding="utf-8").splitlines(keepends=True)
+        self.header, self.lines = lines[0], lines[1:]
+        self.target = Path(target)
+        self.rotate_every = rotate_every
+        self.position = 0
+
+    def _file(self):
+        if self.rotate_every is None:
+            return self.target
+        return self.target.joinpath(f"part_{self.position // self.rotate_every:05d}.csv")
+
+    def write(self, n_lines):
+        """Append the next n_lines lines (fewer at the end of the export), returns how many were written."""
+        written = 0
+        while written < n_lines and self.position < len(self.lines):
+            file = self._file()
+            count = n_lines - written
+            if self.rotate_every is not None:
+                count = min(count, self.rotate_every - self.position % self.rotate_every)
+            chunk = self.lines[self.position:self.position + count]
+            with open(file, "a", encoding="utf-8") as stream:
+                if stream.tell() == 0:
+                    stream.write(self.header)
+                stream.writelines(chunk)
+            self.position += len(chunk)
+            written += len(chunk)
+        return written
+
+    @property
+    def finished(self):
+        return self.position >= len(self.lines)
+
+
+def simulate_live_unconstrained_feed(lines_per_write=500, rotate_every=5000, window="2D"):
+    """Replays TagDetections.csv into rotating files and follows them with a LiveTelemetryFeed."""
+    with tempfile.TemporaryDirectory() as directory:
+        simulator = ReceiverSimulator(ProjectConstants.UNCONSTRAINED_RECEIVER_DATA, directory, rotate_every)
+        feed = LiveTelemetryFeed(directory, kind="unconstrained", window=window)
+        feed.subscribe(lambda batch, frame: print(f"{len(batch)} new detections, {len(frame)} in the window up to "
+                                                  f"{frame['Time (corrected)'].max()}"))
+        while not simulator.finished:
+            simulator.write(lines_per_write)
+            feed.poll()
+        return feed.frame
+
+
+if __name__ == "__main__":
+    simulate_live_unconstrained_feed()
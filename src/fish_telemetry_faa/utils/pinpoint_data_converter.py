@@ -50,10 +50,56 @@ def calculate_temperature_from_data2(df: pandas.DataFrame) -> pandas.DataFrame:
     return df
 
 
-def exclude_all_outliers(df: pandas.DataFrame, unconstrained: bool = False) -> pandas.DataFrame:
+OUTLIER_METHODS = ["zscore", "mad", "rolling"]
+OUTLIER_SCORE_NAMES = {"zscore": "z_score", "mad": "robust_z_score", "rolling": "rolling_z_score"}
+# Scale the median (mean) absolute deviation to the standard deviation of normally distributed data
+MAD_TO_STD = 1.4826
+MEAN_ABSOLUTE_DEVIATION_TO_STD = 1.2533
+
+
+def _scores_or_zero(deviation: np.ndarray, spread: np.ndarray) -> np.ndarray:
+    # Without spread (or without enough values for one) nothing stands out, such values score 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where((spread > 0) & (deviation != 0), deviation / spread, 0.0)
+
+
+def outlier_scores(values: pandas.Series, groups, method="zscore", times=None, window="6h") -> np.ndarray:
+    """Score of every value against the other values of its group, like a z-score.
+
+    "zscore" uses the mean and (population) standard deviation of the group, a group without spread scores its values
+    NaN, which counts as an outlier. "mad" uses the median and the scaled median absolute deviation, or the scaled mean
+    absolute deviation for groups whose median absolute deviation is 0 (e.g. quantised temperatures). "rolling" uses
+    the mean and standard deviation of the group's values in the trailing time window up to each value. For "mad" and
+    "rolling" values without spread around them (a constant group or window, a single value) score 0.
+    """
+    groups = np.asarray(groups)
+    if method == "zscore":
+        grouped = values.groupby(groups, sort=False)
+        return ((values - grouped.transform("mean")) / grouped.transform("std", ddof=0)).to_numpy()
+    if method == "mad":
+        deviation = values - values.groupby(groups, sort=False).transform("median")
+        grouped_deviation = deviation.abs().groupby(groups, sort=False)
+        mad = MAD_TO_STD * grouped_deviation.transform("median").to_numpy()
+        mean_absolute_deviation = MEAN_ABSOLUTE_DEVIATION_TO_STD * grouped_deviation.transform("mean").to_numpy()
+        return _scores_or_zero(deviation.to_numpy(), np.where(mad > 0, mad, mean_absolute_deviation))
+    if method == "rolling":
+        times = pandas.DatetimeIndex(times)
+        # Sorted by group and time, the rolling results line up with the sorted values
+        order = np.lexsort((times.asi8, pandas.factorize(groups, sort=True)[0]))
+        sorted_values = pandas.Series(values.to_numpy()[order], index=times[order])
+        rolling = sorted_values.groupby(groups[order], sort=True).rolling(window, min_periods=2)
+        scores = np.empty(len(values))
+        scores[order] = _scores_or_zero(sorted_values.to_numpy() - rolling.mean().to_numpy(),
+                                        rolling.std(ddof=0).to_numpy())
+        return scores
+    raise ValueError(f"Unknown outlier method {method}, choose one of {OUTLIER_METHODS}")
+
+
+def exclude_all_outliers(df: pandas.DataFrame, unconstrained: bool = False, method="zscore",
+                         threshold=3) -> pandas.DataFrame:
     for name in ["temperature"]:
         # Should exclude eleven points for temperature
-        df = exclude_data2_or_depth_outliers(df, name, unconstrained=unconstrained)
+        df = exclude_data2_or_depth_outliers(df, name, unconstrained=unconstrained, method=method, threshold=threshold)
 
     df = df.loc[df["Depth [m] (est. or from tag)"] <= 9]
     df = df.loc[0 <= df["Depth [m] (est. or from tag)"]]
@@ -61,32 +107,25 @@ def exclude_all_outliers(df: pandas.DataFrame, unconstrained: bool = False) -> p
     return df
 
 
-def exclude_data2_or_depth_outliers(df: pandas.DataFrame, column_name: str, unconstrained=False) -> pandas.DataFrame:
-    df["z_score_temp"] = 0
+def exclude_data2_or_depth_outliers(df: pandas.DataFrame, column_name: str, unconstrained=False, method="zscore",
+                                    threshold=3, window="6h") -> pandas.DataFrame:
+    """Drop the values of column_name scoring threshold or more (see outlier_scores) within their transmitter."""
     if column_name == "temperature":
-        df_small = df.loc[df["is_temperature"]]
+        selected = df["is_temperature"].to_numpy()
     elif column_name == "activity":
-        df_small = df.loc[df["is_activity"]]
+        selected = df["is_activity"].to_numpy()
     elif column_name == "Depth [m] (est. or from tag)":
-        df_small = df
+        selected = np.ones(len(df), dtype=bool)
     else:
         raise AttributeError("No boolean given!")
-    if unconstrained:
-        for name, group in df_small.groupby(df_small.index.get_level_values(1)):
-            df.loc[group.index, "z_score_temp"] = np.divide(group[column_name] - group[column_name].mean(),
-                                                            group[column_name].std(ddof=0))
-        df_lefties = df.loc[df["z_score_temp"] < 3]
-        df_lefties = df_lefties.loc[-3 < df_lefties["z_score_temp"]]
-        print(f"{len(df) - len(df_lefties)} outliers with (z_score > 3) excluded for column {column_name}")
-        df_lefties = df_lefties.drop(columns=["z_score_temp"])
-    else:
-        for name, group in df_small.groupby("Name"):
-            df.loc[group.index, "z_score_temp"] = np.divide(group[column_name] - group[column_name].mean(),
-                                                            group[column_name].std(ddof=0))
-        df_lefties = df.loc[df["z_score_temp"] < 3]
-        df_lefties = df_lefties.loc[-3 < df_lefties["z_score_temp"]]
-        print(f"{len(df) - len(df_lefties)} outliers with (z_score > 3) excluded for column {column_name}")
-        df_lefties = df_lefties.drop(columns=["z_score_temp"])
+    # Transmitters are the ID index level of the unconstrained data and the Name of the constrained data
+    groups = df.index.get_level_values(1) if unconstrained else df["Name"]
+    scores = np.zeros(len(df))
+    scores[selected] = outlier_scores(df.loc[selected, column_name], np.asarray(groups)[selected], method=method,
+                                      times=df.loc[selected, "Time (corrected)"], window=window)
+    df_lefties = df.loc[(-threshold < scores) & (scores < threshold)]
+    print(f"{len(df) - len(df_lefties)} outliers with ({OUTLIER_SCORE_NAMES[method]} > {threshold}) excluded for "
+          f"column {column_name}")
     return df_lefties
 
 
@@ -9,6 +9,7 @@ ROOT_PATH = Path(__file__).parent.parent.parent.parent
 class ProjectConstants():
     ROOT: Final = ROOT_PATH
     DATASETS: Final = ROOT_PATH.joinpath("data")
+    CACHE: Final = ROOT_PATH.joinpath("cache")
     SUN_TIMES = DATASETS.joinpath("Sun Times")
     SUN_TIMES_OFFICIAL = SUN_TIMES.joinpath("official_sun_times_2021.csv")
     SUN_TIMES_CIVIL = SUN_TIMES.joinpath("civil_sun_times_2021.csv")
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+from src.fish_telemetry_faa.utils.project_constants import ProjectConstants
+
+# Zenith angle of the sun's centre at each sunrise/sunset, "official" includes refraction and the solar radius
+SUN_TIME_ZENITHS = {"official": 90.833, "civil": 96.0, "nautical": 102.0, "astronomical": 108.0}
+SUN_TIME_TYPES = list(SUN_TIME_ZENITHS)
+# Crete is UTC +3 during the experiment, like the sun time tables
+UTC_OFFSET_HOURS = 3
+RECEIVERS = ["RECEIVER_1425", "RECEIVER_1426", "RECEIVER_1427", "RECEIVER_MIDDLE"]
+# Boundary seconds per (latitude, longitude, utc offset, resolution) and day, filled by twilight_boundary_seconds
+_boundary_cache = {}
+
+
+def _solar_declination_and_equation_of_time(julian_day: np.ndarray):
+    """Declination (radians) and equation of time (minutes) of the NOAA solar calculator."""
+    t = (julian_day - 2451545.0) / 36525.0
+    mean_longitude = np.radians((280.46646 + t * (36000.76983 + t * 0.0003032)) % 360)
+    mean_anomaly = np.radians(357.52911 + t * (35999.05029 - 0.0001537 * t))
+    eccentricity = 0.016708634 - t * (0.000042037 + 0.0000001267 * t)
+    equation_of_centre = (np.sin(mean_anomaly) * (1.914602 - t * (0.004817 + 0.000014 * t))
+                          + np.sin(2 * mean_anomaly) * (0.019993 - 0.000101 * t)
+                          + np.sin(3 * mean_anomaly) * 0.000289)
+    omega = np.radians(125.04 - 1934.136 * t)
+    apparent_longitude = np.radians(np.degrees(mean_longitude) + equation_of_centre - 0.00569 - 0.00478 * np.sin(omega))
+    mean_obliquity = 23 + (26 + (21.448 - t * (46.815 + t * (0.00059 - t * 0.001813))) / 60) / 60
+    obliquity = np.radians(mean_obliquity + 0.00256 * np.cos(omega))
+    declination = np.arcsin(np.sin(obliquity) * np.sin(apparent_longitude))
+    y = np.tan(obliquity / 2) ** 2
+    equation_of_time = 4 * np.degrees(
+        y * np.sin(2 * mean_longitude) - 2 * eccentricity * np.sin(mean_anomaly)
+        + 4 * eccentricity * y * np.sin(mean_anomaly) * np.cos(2 * mean_longitude)
+        - 0.5 * y ** 2 * np.sin(4 * mean_longitude) - 1.25 * eccentricity ** 2 * np.sin(2 * mean_anomaly))
+    return declination, equation_of_time
+
+
+def solar_event_minutes(dates, latitude, longitude, zenith, utc_offset_hours=UTC_OFFSET_HOURS):
+    """Minutes after local midnight of the sunrise and sunset at the given zenith angle, for every date.
+
+    Follows the NOAA solar calculator, with the sun's position taken at local noon of each date. Dates on which the
+    sun does not reach the zenith angle (polar day or night) give NaN.
+    """
+    dates = pd.DatetimeIndex(dates).normalize()
+    # Julian day at local noon
+    julian_day = dates.to_julian_date().to_numpy() + 0.5 - utc_offset_hours / 24
+    declination, equation_of_time = _solar_declination_and_equation_of_time(julian_day)
+    latitude = np.radians(latitude)
+    with np.errstate(invalid="ignore"):
+        hour_angle = np.degrees(np.arccos(np.cos(np.radians(zenith)) / (np.cos(latitude) * np.cos(declination))
+                                          - np.tan(latitude) * np.tan(declination)))
+    solar_noon = 720 - 4 * longitude - equation_of_time + utc_offset_hours * 60
+    return solar_noon - 4 * hour_angle, solar_noon + 4 * hour_angle
+
+
+def twilight_boundary_seconds(dates, latitude, longitude, utc_offset_hours=UTC_OFFSET_HOURS,
+                              resolution_seconds=60) -> np.ndarray:
+    """Sunrise and sunset seconds after midnight of every SUN_TIME_TYPES, shape (dates, types, [sunrise, sunset]).
+
+    The times are rounded to resolution_seconds (whole minutes like the sun time tables). Dates already computed for
+    the same position are taken from a cache, only the others are computed, all in one vectorized pass.
+    """
+    dates = pd.DatetimeIndex(dates).normalize()
+    cache = _boundary_cache.setdefault((latitude, longitude, utc_offset_hours, resolution_seconds), {})
+    missing = dates[~dates.isin(list(cache))].unique()
+    if len(missing):
+        events = [solar_event_minutes(missing, latitude, longitude, SUN_TIME_ZENITHS[sun_time_type],
+                                      utc_offset_hours) for sun_time_type in SUN_TIME_TYPES]
+        # Float seconds, so days without the event stay NaN
+        seconds = np.round(np.stack([np.stack(event, axis=-1) for event in events], axis=1) * 60 / resolution_seconds)
+        cache.update(zip(missing, seconds * resolution_seconds))
+    return np.stack([cache[date] for date in dates]) if len(dates) else np.empty((0, len(SUN_TIME_TYPES), 2))
+
+
+def receiver_sun_times(start_date, end_date, receiver="RECEIVER_MIDDLE", utc_offset_hours=UTC_OFFSET_HOURS):
+    """Sunrise and sunset per date and type at a receiver of ProjectConstants, in the long format of the tables."""
+    position = getattr(ProjectConstants, receiver)
+    dates = pd.date_range(start_date, end_date, freq="D")
+    seconds = twilight_boundary_seconds(dates, position["Latitude"], position["Longitude"], utc_offset_hours)
+    frames = [pd.DataFrame({"type": sun_time_type, "sunrise": seconds[:, i, 0], "sunset": seconds[:, i, 1]},
+                           index=dates.rename("Datum")) for i, sun_time_type in enumerate(SUN_TIME_TYPES)]
+    return pd.concat(frames, keys=SUN_TIME_TYPES, names=["type", "dates"])
+
+
+def compare_with_sun_time_tables(receiver="RECEIVER_MIDDLE") -> pd.DataFrame:
+    """Largest difference in minutes between the computed and the tabled sun times, per type and event."""
+    from src.fish_telemetry_faa.utils.sun_times import get_sun_timer
+
+    sun_timer = get_sun_timer()
+    position = getattr(ProjectConstants, receiver)
+    computed = twilight_boundary_seconds(sun_timer.dates, position["Latitude"], position["Longitude"])
+    differences = pd.DataFrame(
+        {event: [np.nanmax(np.abs(computed[:, SUN_TIME_TYPES.index(sun_time_type), j] -
+                                  sun_timer.seconds(f"{event}_{sun_time_type}"))) / 60
+                 for sun_time_type in SUN_TIME_TYPES] for j, event in enumerate(["sunrise", "sunset"])},
+        index=SUN_TIME_TYPES)
+    print(differences)
+    return differences
+
+
+if __name__ == "__main__":
+    compare_with_sun_time_tables()
+    for receiver_name in RECEIVERS:
+        print(receiver_name, receiver_sun_times("2021-05-26", "2021-05-27", receiver_name).iloc[0].to_dict())
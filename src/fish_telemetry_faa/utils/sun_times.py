@@ -1,199 +1,220 @@
+import datetime
 from pathlib import Path
 
+import numpy as np
 import pandas
 import pandas as pd
 import plotly.graph_objects as go
 from pandas import DataFrame
 
-from src.fish_telemetry_faa.utils.filter_util import get_data_between_hour_times
 from src.fish_telemetry_faa.utils.project_constants import ProjectConstants
+from src.fish_telemetry_faa.utils.solar_position import SUN_TIME_TYPES, UTC_OFFSET_HOURS
+from src.fish_telemetry_faa.utils.solar_position import twilight_boundary_seconds as solar_twilight_boundary_seconds
 from src.fish_telemetry_faa.utils.transmitter_datasheets import TransmitterDataSheet
 
 
+def read_sun_times_csv(file: Path) -> pd.DataFrame:
+    return pd.read_csv(file, header=0, skipinitialspace=True)
+
+
+def sun_time_type(file: Path) -> str:
+    return Path(file).stem.rstrip("sun_times_2021")
+
+
+def _clock_strings(seconds: np.ndarray):
+    return [f"{second // 3600:02d}:{second % 3600 // 60:02d}:{second % 60:02d}" for second in seconds]
+
+
 class SunTimer(object):
+    """Sunrise and sunset of the experiment days for every twilight type (one CSV per type).
 
-    def __init__(self):
-        self._official = self.parse_and_read(ProjectConstants.SUN_TIMES_OFFICIAL)
-        self._civil = self.parse_and_read(ProjectConstants.SUN_TIMES_CIVIL)
-        self._nautical = self.parse_and_read(ProjectConstants.SUN_TIMES_NAUTICAL)
-        self._astronomic = self.parse_and_read(ProjectConstants.SUN_TIMES_ASTRONOMICAL)
-        self._csv_files = {}
-        self._add_all_scientific_csv_files()
-        self._all_sun_times = pd.concat(self._csv_files.values(), keys=self._csv_files.keys(), names=["type", "dates"])
-        self._all_sun_times_unified = {}
-
-    def _add_all_scientific_csv_files(self):
-        for file in ProjectConstants.SUN_TIMES.glob('*.csv'):
-            df_indexed_datetime = self.parse_and_read(file)
-            self._csv_files[file.stem] = df_indexed_datetime
+    Every CSV is parsed once into a table of the seconds since midnight of sunrise and sunset per date and type, from
+    which the long (get_all_sun_times_variations) and unified (load_unified_sun_time_sheet_with_id) views are built.
+    get_sun_timer() gives the instance shared by the whole process.
+    """
+
+    def __init__(self, sun_time_tables: dict = None):
+        """sun_time_tables optionally holds the already read sun time CSVs by path (see read_sun_times_csv)."""
+        sun_time_tables = {Path(file): table for file, table in (sun_time_tables or {}).items()}
+        files = list(ProjectConstants.SUN_TIMES.glob('*.csv'))
+        self.types = [sun_time_type(file) for file in files]
+        self._file_stems = [file.stem for file in files]
+        self.dates = None
+        rise_and_set = []
+        for file in files:
+            df = sun_time_tables[file] if file in sun_time_tables else read_sun_times_csv(file)
+            dates = pd.DatetimeIndex(pd.to_datetime(df[['month', 'day']].assign(year=2021)[['year', 'month', 'day']]))
+            in_experiment = ((ProjectConstants.START_OF_EXPERIMENT <= dates) &
+                             (dates <= ProjectConstants.END_OF_EXPERIMENT_INCLUSIVE))
+            if self.dates is None:
+                self.dates = dates[in_experiment]
+            elif not self.dates.equals(dates[in_experiment]):
+                raise ValueError(f"The sun times of {file.name} cover other dates than {files[0].name}")
+            # The times are written as hmm or hhmm
+            hours_minutes = df[["rise", "set"]].to_numpy(dtype=np.int64)[in_experiment]
+            rise_and_set.append(hours_minutes // 100 * 3600 + hours_minutes % 100 * 60)
+        # Seconds since midnight, shape (dates, types, [sunrise, sunset])
+        self.boundary_seconds = np.stack(rise_and_set, axis=1)
+        self._all_sun_times = None
+        self._unified = None
+
+    @classmethod
+    def from_solar_position(cls, start_date, end_date, receiver="RECEIVER_MIDDLE",
+                            utc_offset_hours=UTC_OFFSET_HOURS) -> "SunTimer":
+        """SunTimer of any date range at a receiver of ProjectConstants, computed instead of read from the tables."""
+        position = getattr(ProjectConstants, receiver)
+        dates = pd.date_range(start_date, end_date, freq="D", name="Datum")
+        boundary_seconds = solar_twilight_boundary_seconds(dates, position["Latitude"], position["Longitude"],
+                                                           utc_offset_hours)
+        if np.isnan(boundary_seconds).any():
+            raise ValueError(f"The sun does not reach every twilight at {receiver} on some dates, e.g. polar days")
+        sun_timer = cls.__new__(cls)
+        sun_timer.types = list(SUN_TIME_TYPES)
+        sun_timer._file_stems = [f"{sun_time_type}_sun_times" for sun_time_type in SUN_TIME_TYPES]
+        sun_timer.dates = dates
+        sun_timer.boundary_seconds = boundary_seconds.astype(np.int64)
+        sun_timer._all_sun_times = None
+        sun_timer._unified = None
+        return sun_timer
+
+    def seconds(self, column) -> np.ndarray:
+        """Seconds since midnight per date of a column like "sunrise_official"."""
+        event, sun_time_type = column.split("_", 1)
+        return self.boundary_seconds[:, self.types.index(sun_time_type), ["sunrise", "sunset"].index(event)]
 
     def get_all_sun_times_variations(self):
-        return self._all_sun_times
+        if self._all_sun_times is None:
+            frames = [self._long_view(sun_time_type) for sun_time_type in self.types]
+            self._all_sun_times = pd.concat(frames, keys=self._file_stems, names=["type", "dates"])
+        return self._all_sun_times.copy()
+
+    def _long_view(self, sun_time_type):
+        df = pd.DataFrame({"type": sun_time_type, "Datum": self.dates}, index=self.dates.rename("Datum"))
+        for event, hours_column in [("sunrise", "dawn"), ("sunset", "dusk")]:
+            seconds = self.seconds(f"{event}_{sun_time_type}")
+            df[event] = _clock_strings(seconds)
+            df[hours_column] = seconds // 3600 + seconds % 3600 // 60 / 60
+        return df[["type", "Datum", "sunrise", "sunset", "dawn", "dusk"]]
 
     def parse_and_read(self, file: Path):
-        df = pd.read_csv(file, header=0, skipinitialspace=True)
-        # create date
-        df.loc[:, "type"] = file.stem.rstrip("sun_times_2021")
-        df.loc[:, "year"] = 2021
-        df.loc[:, "Datum"] = pd.DatetimeIndex(
-            pd.to_datetime(df[['year', 'month', 'day']], format='%d.%m.%Y'))
-        df = df.set_index(df["Datum"])
-
-        # Getting sunrise and sunset
-        df["sunrise"] = df["rise"].map('{:0>4}'.format)
-        df["sunrise"] = [f"{x[:2]}:{x[-2:]}:00" for x in df["sunrise"]]
-        df["sunset"] = df["set"].map('{:0>4}'.format)
-        df["sunset"] = [f"{x[:2]}:{x[-2:]}:00" for x in df["sunset"]]
-        dawn_time = pd.DatetimeIndex(pd.to_datetime(df["sunrise"]))
-        df.loc[df.index, "dawn"] = dawn_time.hour + dawn_time.minute / 60 + dawn_time.second / 3600
-        dusk_time = pd.DatetimeIndex(pd.to_datetime(df["sunset"]))
-        df.loc[df.index, "dusk"] = dusk_time.hour + dusk_time.minute / 60 + dusk_time.second / 3600
-        df = df.drop(columns=["month", "day", "year", "rise", "set"])
-        df_indexed_datetime = df[
-                              ProjectConstants.START_OF_EXPERIMENT:ProjectConstants.END_OF_EXPERIMENT_INCLUSIVE]
-        return df_indexed_datetime
+        return self._long_view(sun_time_type(file))
 
     def load_unified_sun_time_sheet_with_id(self):
-        for file in ProjectConstants.SUN_TIMES.glob('*.csv'):
-            df = pd.read_csv(file, header=0, skipinitialspace=True)
-            file_stem = file.stem.rstrip("sun_times_2021")
-            df.loc[:, "type"] = file_stem
-            df.loc[:, "year"] = 2021
-            df.loc[:, "Datum"] = pd.DatetimeIndex(
-                pd.to_datetime(df[['year', 'month', 'day']], format='%d.%m.%Y'))
-            df = df.set_index(df["Datum"])
-
-            # Getting sunrise and sunset
-            df[f"sunrise_{file_stem}"] = df["rise"].map('{:0>4}'.format)
-            df[f"sunrise_{file_stem}"] = [f"{x[:2]}:{x[-2:]}:00" for x in df[f"sunrise_{file_stem}"]]
-            df[f"sunrise_{file_stem}"] = pd.to_datetime(df.loc[:, f"sunrise_{file_stem}"]).dt.time
-            df[f"sunset_{file_stem}"] = df["set"].map('{:0>4}'.format)
-            df[f"sunset_{file_stem}"] = [f"{x[:2]}:{x[-2:]}:00" for x in df[f"sunset_{file_stem}"]]
-            df[f"sunset_{file_stem}"] = pd.to_datetime(df.loc[:, f"sunset_{file_stem}"]).dt.time
-
-            df = df.drop(columns=["month", "day", "year", "rise", "set"])
-            df = df[ProjectConstants.START_OF_EXPERIMENT:ProjectConstants.END_OF_EXPERIMENT_INCLUSIVE]
-            df = df.drop(columns=["type", "Datum"])
-            self._all_sun_times_unified[file_stem] = df
-
-        all_df = pd.concat(self._all_sun_times_unified.values(), axis=1)
-        all_df["temp_id"] = all_df.index.date
-        return all_df
-
-
-def set_correct_time_of_day(df: DataFrame, lower_col_bound: str, upper_col_bound: str, value_for_column) -> DataFrame:
-    stuff = df.query(f"{lower_col_bound} <= time < {upper_col_bound}")
-    df.loc[stuff.index, "time_of_day"] = value_for_column
-    return df
+        if self._unified is None:
+            df = pd.DataFrame(index=self.dates.rename("Datum"))
+            for sun_time_type in self.types:
+                for event in ["sunrise", "sunset"]:
+                    seconds = self.seconds(f"{event}_{sun_time_type}")
+                    df[f"{event}_{sun_time_type}"] = [datetime.time(second // 3600, second % 3600 // 60, second % 60)
+                                                      for second in seconds]
+            df["temp_id"] = df.index.date
+            self._unified = df
+        return self._unified.copy()
 
+    def twilight_boundary_seconds(self) -> np.ndarray:
+        """Seconds since midnight of all TWILIGHT_BOUNDARIES, one row per date."""
+        boundary_seconds = np.column_stack([self.seconds(column) for column in TWILIGHT_BOUNDARIES])
+        assert (np.diff(boundary_seconds, axis=1) > 0).all(), "Twilight boundaries are not in chronological order!"
+        return boundary_seconds
 
-def set_correct_night(df: DataFrame, lower_col_bound: str, upper_col_bound: str, value_for_column) -> DataFrame:
-    stuff = df.query(f"{lower_col_bound} <= time | time < {upper_col_bound}")
-    df.loc[stuff.index, "time_of_day"] = value_for_column
-    return df
 
+_sun_timers = {}
 
-def correlate_sun_timer_with_fish_positions(df: DataFrame):
-    sun_times = SunTimer()
-    st_df = sun_times.load_unified_sun_time_sheet_with_id()
+
+def get_sun_timer() -> SunTimer:
+    """The SunTimer of the process, parsed again only when a sun time CSV changed."""
+    fingerprint = tuple((str(file), file.stat().st_mtime_ns, file.stat().st_size)
+                        for file in sorted(ProjectConstants.SUN_TIMES.glob('*.csv')))
+    if fingerprint not in _sun_timers:
+        _sun_timers.clear()
+        _sun_timers[fingerprint] = SunTimer()
+    return _sun_timers[fingerprint]
+
+
+TIME_OF_DAY_CATEGORIES = ["Night", "Astronomical Twilight", "Nautical Twilight", "Civil Twilight", "Day"]
+# The twilight boundaries of one date in chronological order
+TWILIGHT_BOUNDARIES = [ProjectConstants.SUNRISE_ASTRONOMICAL, ProjectConstants.SUNRISE_NAUTICAL,
+                       ProjectConstants.SUNRISE_CIVIL, ProjectConstants.SUNRISE_OFFICIAL,
+                       ProjectConstants.SUNSET_OFFICIAL, ProjectConstants.SUNSET_CIVIL,
+                       ProjectConstants.SUNSET_NAUTICAL, ProjectConstants.SUNSET_ASTRONOMICAL]
+# Time of day (as category code) before the first, between two and after the last twilight boundary
+TIME_OF_DAY_CODES_BETWEEN_BOUNDARIES = np.array([0, 1, 2, 3, 4, 3, 2, 1, 0])
+SECONDS_PER_DAY = 24 * 3600
+
+
+def classify_time_of_day(date_codes: np.ndarray, seconds_of_day: np.ndarray,
+                         boundary_seconds: np.ndarray) -> pandas.Categorical:
+    """Time of day for every signal, given the row of its date in boundary_seconds (-1 if missing).
+
+    Lower boundaries are inclusive, upper boundaries exclusive. All dates are laid out on one time axis, so a single
+    searchsorted finds the twilight interval of every signal.
+    """
+    n_boundaries = boundary_seconds.shape[1]
+    day_offsets = np.arange(len(boundary_seconds), dtype=np.int64)[:, None] * SECONDS_PER_DAY
+    all_boundaries = (boundary_seconds + day_offsets).ravel()
+    valid_dates = date_codes >= 0
+    safe_date_codes = np.where(valid_dates, date_codes, 0)
+    positions = np.searchsorted(all_boundaries, safe_date_codes * SECONDS_PER_DAY + seconds_of_day, side="right")
+    codes = TIME_OF_DAY_CODES_BETWEEN_BOUNDARIES[positions - safe_date_codes * n_boundaries]
+    codes = np.where(valid_dates, codes, -1)
+    return pandas.Categorical.from_codes(codes, categories=TIME_OF_DAY_CATEGORIES)
+
+
+def correlate_sun_timer_with_fish_positions(df: DataFrame, sun_timer: SunTimer = None):
+    if sun_timer is None:
+        sun_timer = get_sun_timer()
+    st_df = sun_timer.load_unified_sun_time_sheet_with_id()
     if df.index.nlevels == 2:
-        df['temp_id'] = df.index.get_level_values(1).date
-        df = df.merge(st_df, how="left", on='temp_id').set_axis(df.index)
-        df["time"] = df.index.get_level_values(1).time
+        times = pd.DatetimeIndex(df.index.get_level_values(1))
     elif df.index.nlevels == 3:
-        df['temp_id'] = df.index.get_level_values(2).date
-        df = df.merge(st_df, how="left", on='temp_id').set_axis(df.index)
-        df["time"] = df.index.get_level_values(2).time
+        times = pd.DatetimeIndex(df.index.get_level_values(2))
     else:
-        df['temp_id'] = df.index.date
-        df = df.merge(st_df, how="left", on='temp_id').set_axis(df.index)
-        df["time"] = df.index.time
-    df["time_of_day"] = "INVALID"
-    # Change all the names
-
-    df_temp = df[[
-        "time", "time_of_day", ProjectConstants.SUNRISE_OFFICIAL, ProjectConstants.SUNRISE_CIVIL,
-        ProjectConstants.SUNRISE_NAUTICAL, ProjectConstants.SUNRISE_ASTRONOMICAL,
-        ProjectConstants.SUNSET_ASTRONOMICAL, ProjectConstants.SUNSET_NAUTICAL,
-        ProjectConstants.SUNSET_CIVIL, ProjectConstants.SUNSET_OFFICIAL]].copy()
-
-    df_temp = set_correct_time_of_day(df_temp, ProjectConstants.SUNRISE_OFFICIAL,
-                                      ProjectConstants.SUNSET_OFFICIAL,
-                                      value_for_column="Day")
-    df_temp = set_correct_time_of_day(df_temp, ProjectConstants.SUNSET_OFFICIAL, ProjectConstants.SUNSET_CIVIL,
-                                      value_for_column="Civil Twilight")
-    df_temp = set_correct_time_of_day(df_temp, ProjectConstants.SUNSET_CIVIL, ProjectConstants.SUNSET_NAUTICAL,
-                                      value_for_column="Nautical Twilight")
-    df_temp = set_correct_time_of_day(df_temp, ProjectConstants.SUNSET_NAUTICAL,
-                                      ProjectConstants.SUNSET_ASTRONOMICAL,
-                                      value_for_column="Astronomical Twilight")
-    df_temp = set_correct_night(df_temp, ProjectConstants.SUNSET_ASTRONOMICAL,
-                                ProjectConstants.SUNRISE_ASTRONOMICAL,
-                                value_for_column="Night")
-    df_temp = set_correct_time_of_day(df_temp, ProjectConstants.SUNRISE_ASTRONOMICAL,
-                                      ProjectConstants.SUNRISE_NAUTICAL,
-                                      value_for_column="Astronomical Twilight")
-    df_temp = set_correct_time_of_day(df_temp, ProjectConstants.SUNRISE_NAUTICAL, ProjectConstants.SUNRISE_CIVIL,
-                                      value_for_column="Nautical Twilight")
-    df_temp = set_correct_time_of_day(df_temp, ProjectConstants.SUNRISE_CIVIL, ProjectConstants.SUNRISE_OFFICIAL,
-                                      value_for_column="Civil Twilight")
-    df["time_of_day"] = df_temp["time_of_day"]
-    assert df.equals(df.mask(df_temp["time_of_day"] == "INVALID", "FAIL"))
+        times = pd.DatetimeIndex(df.index)
+    days = times.normalize()
+    df['temp_id'] = days.date
+    # Row of the unified sun time sheet for the date of every signal, -1 for dates without sun times
+    sheet_days = pd.DatetimeIndex(st_df.index).normalize()
+    date_codes = sheet_days.get_indexer(days)
+    for column in st_df.columns.drop("temp_id"):
+        df[column] = pd.api.extensions.take(st_df[column].to_numpy(), date_codes, allow_fill=True)
+    df["time"] = times.time
+    seconds_of_day = (times.asi8 - days.asi8) // 10 ** 9
+    df["time_of_day"] = classify_time_of_day(date_codes, seconds_of_day, sun_timer.twilight_boundary_seconds())
+    n_invalid = df["time_of_day"].isna().sum()
+    assert n_invalid == 0, f"No time of day for {n_invalid} signals, the sun times do not cover their dates!"
     return df
 
 
+TIME_OF_DAY_INTERVALS = ["Sunrise to 8:00", "8:00 to 10:00", "10:00 to 12:00", "12:00 to 14:00", "14:00 to 16:00",
+                         "16:00 to Sunset"]
+
+
+def _times_to_seconds(times: pandas.Series) -> pandas.Series:
+    return times.map(lambda time: time.hour * 3600 + time.minute * 60 + time.second)
+
+
 def add_time_of_day_intervals(df: pandas.DataFrame, drop_sun_times=False, short_nights=True) -> pandas.DataFrame:
-    list_of_small_dfs = []
-    df["time_of_day_interval"] = "Official Night Time"
-    for date in sorted(set(df["temp_id"])):
-        df_small_date = df.loc[df["temp_id"] == date]
-        # The data already has the different sunrise/sunsets, "ID" == "date"
-        if short_nights:
-            sun_rise = df_small_date["sunrise_astronomical"].values[0]
-            sun_rise_float = sun_rise.hour + (sun_rise.minute / 60) + (sun_rise.second / 3600)
-            sun_set = df_small_date["sunset_astronomical"].values[0]
-            sun_set_float = sun_set.hour + (sun_set.minute / 60) + (sun_set.second / 3600)
-            df_start_8 = get_data_between_hour_times(df_small_date.copy(), time_first=sun_rise_float, time_last=8)
-            df_start_8.loc[df_small_date["time_of_day"] != "Night", ["time_of_day_interval"]] = "Sunrise to 8:00"
-            df_810 = get_data_between_hour_times(df_small_date.copy(), time_first=8, time_last=10)
-            df_810.loc[df_small_date["time_of_day"] != "Night", ["time_of_day_interval"]] = "8:00 to 10:00"
-            df_1012 = get_data_between_hour_times(df_small_date.copy(), time_first=10, time_last=12)
-            df_1012.loc[df_small_date["time_of_day"] != "Night", ["time_of_day_interval"]] = "10:00 to 12:00"
-            df_1214 = get_data_between_hour_times(df_small_date.copy(), time_first=12, time_last=14)
-            df_1214.loc[df_small_date["time_of_day"] != "Night", ["time_of_day_interval"]] = "12:00 to 14:00"
-            df_1416 = get_data_between_hour_times(df_small_date.copy(), time_first=14, time_last=16)
-            df_1416.loc[df_small_date["time_of_day"] != "Night", ["time_of_day_interval"]] = "14:00 to 16:00"
-            df_16_end = get_data_between_hour_times(df_small_date.copy(), time_first=16, time_last=sun_set_float)
-            df_16_end.loc[df_small_date["time_of_day"] != "Night", ["time_of_day_interval"]] = "16:00 to Sunset"
-            df_small_date = pd.concat([df_start_8, df_810, df_1012, df_1214, df_1416, df_16_end])
-            list_of_small_dfs.append(df_small_date)
-        else:
-            sun_rise = df_small_date["sunrise_official"].values[0]
-            sun_rise_float = sun_rise.hour + (sun_rise.minute / 60) + (sun_rise.second / 3600)
-            sun_set = df_small_date["sunset_official"].values[0]
-            sun_set_float = sun_set.hour + (sun_set.minute / 60) + (sun_set.second / 3600)
-            df_start_8 = get_data_between_hour_times(df_small_date.copy(), time_first=sun_rise_float, time_last=8)
-            df_start_8.loc[df_small_date["time_of_day"] == "Day", ["time_of_day_interval"]] = "Sunrise to 8:00"
-            df_810 = get_data_between_hour_times(df_small_date.copy(), time_first=8, time_last=10)
-            df_810.loc[df_small_date["time_of_day"] == "Day", ["time_of_day_interval"]] = "8:00 to 10:00"
-            df_1012 = get_data_between_hour_times(df_small_date.copy(), time_first=10, time_last=12)
-            df_1012.loc[df_small_date["time_of_day"] == "Day", ["time_of_day_interval"]] = "10:00 to 12:00"
-            df_1214 = get_data_between_hour_times(df_small_date.copy(), time_first=12, time_last=14)
-            df_1214.loc[df_small_date["time_of_day"] == "Day", ["time_of_day_interval"]] = "12:00 to 14:00"
-            df_1416 = get_data_between_hour_times(df_small_date.copy(), time_first=14, time_last=16)
-            df_1416.loc[df_small_date["time_of_day"] == "Day", ["time_of_day_interval"]] = "14:00 to 16:00"
-            df_16_end = get_data_between_hour_times(df_small_date.copy(), time_first=16, time_last=sun_set_float)
-            df_16_end.loc[df_small_date["time_of_day"] == "Day", ["time_of_day_interval"]] = "16:00 to Sunset"
-            df_small_date = pd.concat([df_start_8, df_810, df_1012, df_1214, df_1416, df_16_end])
-            list_of_small_dfs.append(df_small_date)
-    df_update = pd.concat(list_of_small_dfs)
     if short_nights:
-        df_update = df_update.loc[df_update["time_of_day"] != "Night"]
+        sun_rise_column, sun_set_column = "sunrise_astronomical", "sunset_astronomical"
+        in_interval_time = (df["time_of_day"] != "Night").to_numpy()
     else:
-        df_update = df_update.loc[df_update["time_of_day"] == "Day"]
-    assert len(df_update.loc[df_update[
-                                 "time_of_day_interval"] == "Official Night Time"]) == 0, "Error when calculating the time of day intervals!"
-    df.update(df_update["time_of_day_interval"])
+        sun_rise_column, sun_set_column = "sunrise_official", "sunset_official"
+        in_interval_time = (df["time_of_day"] == "Day").to_numpy()
+    time_column = "datum" if df.index.nlevels == 2 else "Time (corrected)"
+    times = df[time_column].dt
+    seconds_of_day = (times.hour * 3600 + times.minute * 60 + times.second).to_numpy()
+    # The data already has the different sunrise/sunsets, "ID" == "date", so they are converted once per date
+    sun_times_per_date = df[["temp_id", sun_rise_column, sun_set_column]].drop_duplicates("temp_id")
+    sun_times_per_date = sun_times_per_date.set_index("temp_id")
+    sun_rise_seconds = df["temp_id"].map(_times_to_seconds(sun_times_per_date[sun_rise_column])).to_numpy()
+    sun_set_seconds = df["temp_id"].map(_times_to_seconds(sun_times_per_date[sun_set_column])).to_numpy()
+    interval_bounds = [sun_rise_seconds, 8 * 3600, 10 * 3600, 12 * 3600, 14 * 3600, 16 * 3600, sun_set_seconds]
+    # Each interval excludes its first and includes its last time, like get_data_between_hour_times
+    conditions = [(time_first < seconds_of_day) & (seconds_of_day <= time_last) & in_interval_time
+                  for time_first, time_last in zip(interval_bounds[:-1], interval_bounds[1:])]
+    # Signals outside the day (or short night) or in no interval, e.g. exactly at sunrise, stay "Official Night Time"
+    time_of_day_interval = np.select(conditions, TIME_OF_DAY_INTERVALS, default="Official Night Time")
+    df["time_of_day_interval"] = time_of_day_interval
     if drop_sun_times:
         df = df.drop(
             columns=["sunrise_astronomical", "sunset_astronomical", "sunrise_nautical", "sunset_nautical",
@@ -245,7 +266,7 @@ def plot_all_sun_times():
 
 
 if __name__ == "__main__":
-    sun_timer = SunTimer()
+    sun_timer = get_sun_timer()
     data_sheet = TransmitterDataSheet(empty=False)
     df = data_sheet.get_all_current_csv_files_as_one_df()
     df = correlate_sun_timer_with_fish_positions(df)
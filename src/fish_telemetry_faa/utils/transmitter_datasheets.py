@@ -1,11 +1,54 @@
+import numpy as np
 import pandas as pd
 
 from src.fish_telemetry_faa.utils.project_constants import ProjectConstants
+from src.fish_telemetry_faa.utils.telemetry_schema import CONSTRAINED_TRANSMITTER_SCHEMA, \
+    UNCONSTRAINED_DETECTIONS_SCHEMA, read_telemetry_csv
+
+
+def concat_keeping_categories(frames, **concat_kwargs):
+    """pd.concat that keeps categorical columns categorical, even when the frames saw different categories."""
+    for column in CONSTRAINED_TRANSMITTER_SCHEMA.categorical_columns:
+        if all(column in frame.columns and isinstance(frame[column].dtype, pd.CategoricalDtype) for frame in frames):
+            categories = sorted(set().union(*(frame[column].cat.categories for frame in frames)))
+            frames = [frame.assign(**{column: frame[column].cat.set_categories(categories)}) for frame in frames]
+    return pd.concat(frames, **concat_kwargs)
+
+
+def fish_numbers_of_names(names) -> dict:
+    """Fish number of every tag name, e.g. "T-1001" and "T-1002" both belong to fish 1002.
+
+    In sorted order, every name not yet assigned claims its number plus one for itself and the name with that number.
+    """
+    fish_numbers = {}
+    for name in sorted(names):
+        if name in fish_numbers:
+            continue
+        prefix, identifier = name.split("-")[0], int(name.split("-")[1])
+        fish_numbers[name] = identifier + 1
+        fish_numbers[prefix + "-" + str(identifier + 1)] = identifier + 1
+    return {name: fish_numbers[name] for name in names}
+
+
+def report_unpaired_tags(fish_numbers: dict):
+    """Tags (names or IDs) that are the only tag of their fish, i.e. whose ID/ID+1 partner sent no signal."""
+    if not fish_numbers:
+        return []
+    tags_per_fish = pd.Series(list(fish_numbers.keys()), dtype=object).groupby(list(fish_numbers.values())).agg(list)
+    unpaired = sorted(tags[0] for tags in tags_per_fish if len(tags) == 1)
+    if unpaired:
+        print(f"{len(unpaired)} tags without their ID/ID+1 partner: {unpaired}")
+    return unpaired
 
 
 class TransmitterDataSheet:
-    def __init__(self, empty=False):
+    def __init__(self, empty=False, chunksize=None, snr_slider_values=None, hdop_slider_values=None):
+        """With a chunksize, every file is streamed and each chunk is cut to the experiment window, filtered by the
+        SNR/HDOP slider values and narrowed to compact dtypes before it is kept."""
         self._csv_files = {}
+        self._chunksize = chunksize
+        self._snr_slider_values = snr_slider_values
+        self._hdop_slider_values = hdop_slider_values
         if not empty:
             self._add_all_csv_files()
 
@@ -18,42 +61,61 @@ class TransmitterDataSheet:
         return self._csv_files
 
     def add_one_csv_file(self, file):
-        df_indexed = pd.read_csv(file, header=0, skipinitialspace=True)
-        df_indexed["time_index"] = pd.to_datetime(df_indexed["Time (UTC)"]) + pd.DateOffset(
-            hours=3)  # Crete is +3 towards UTC!
-        df_indexed["Time (corrected)"] = pd.to_datetime(df_indexed["Time (UTC)"]) + pd.DateOffset(
-            hours=3)  # Crete is +3 towards UTC!
-        df_indexed = df_indexed.set_index(df_indexed["time_index"])
-        datetime_series = pd.to_datetime(df_indexed.index)
-        datetime_index = pd.DatetimeIndex(datetime_series.values)
+        if self._chunksize:
+            chunks = [self._filter_and_narrow(self._index_by_corrected_time(chunk))
+                      for chunk in read_telemetry_csv(file, CONSTRAINED_TRANSMITTER_SCHEMA, chunksize=self._chunksize)]
+            self._csv_files[file.stem] = concat_keeping_categories(chunks)
+        else:
+            self.add_read_csv_file(file.stem, read_telemetry_csv(file, CONSTRAINED_TRANSMITTER_SCHEMA))
+
+    def add_read_csv_file(self, name, df_indexed):
+        """Add the frame of a transmitter file that was already read with read_telemetry_csv."""
+        self._csv_files[name] = self._index_by_corrected_time(df_indexed)
+
+    @staticmethod
+    def _index_by_corrected_time(df_indexed):
+        time_corrected = df_indexed["Time (UTC)"] + pd.DateOffset(hours=3)  # Crete is +3 towards UTC!
+        df_indexed["time_index"] = time_corrected
+        df_indexed["Time (corrected)"] = time_corrected
+        datetime_index = pd.DatetimeIndex(time_corrected.values)
         df_indexed["datum"] = datetime_index
         df_indexed_datetime = df_indexed.set_index(datetime_index)
-        df_indexed_datetime = df_indexed_datetime[
-                              ProjectConstants.START_OF_EXPERIMENT:ProjectConstants.END_OF_EXPERIMENT_INCLUSIVE]
-        self._csv_files[file.stem] = df_indexed_datetime
+        in_experiment = (ProjectConstants.START_OF_EXPERIMENT <= datetime_index) & (
+                datetime_index <= ProjectConstants.END_OF_EXPERIMENT_INCLUSIVE)
+        return df_indexed_datetime[in_experiment]
+
+    def _filter_and_narrow(self, df):
+        if self._snr_slider_values is not None:
+            df = df[(df['SNR [dB]'] >= self._snr_slider_values[0]) & (df['SNR [dB]'] < self._snr_slider_values[1])]
+        if self._hdop_slider_values is not None:
+            df = df[(df['HDOP'] >= self._hdop_slider_values[0]) & (df['HDOP'] < self._hdop_slider_values[1])]
+        df = df.astype({"Depth [m] (est. or from tag)": "float32", "Name": "category"})
+        df["Data2 (DS256 only)"] = pd.to_numeric(df["Data2 (DS256 only)"], downcast="integer")
+        return df
 
     def get_all_current_csv_files_as_one_df(self):
-        df = pd.concat(self._csv_files.values(), keys=self._csv_files.keys(), names=["fish_name", "dates"])
+        df = concat_keeping_categories(list(self._csv_files.values()), keys=self._csv_files.keys(),
+                                       names=["fish_name", "dates"])
         df = self.add_fish_numbers(df)
         return df
 
     def add_fish_numbers(self, df):
-        df["fish_number"] = -1
-        for name in sorted(set(df["Name"])):
-            identifier = int(name.split("-")[1])
-            other_name = name.split("-")[0] + "-" + str(identifier + 1)
-            if (df.loc[df["Name"] == name, "fish_number"] == -1).all():
-                try:
-                    df.loc[df["Name"] == name, "fish_number"] = identifier + 1
-                    df.loc[df["Name"] == other_name, "fish_number"] = identifier + 1
-                except ValueError:
-                    pass
+        # The pairs are found among the few distinct names, every signal then takes the number of its name's code
+        names = pd.Categorical(df["Name"])
+        fish_numbers = fish_numbers_of_names(names.categories)
+        report_unpaired_tags(fish_numbers)
+        lookup = np.append([fish_numbers[name] for name in names.categories], -1).astype(np.int64)
+        df["fish_number"] = lookup[names.codes]
         return df
 
+
 class UnconstrainedTransmitterDataSheet:
-    def __init__(self):
-        self.excel_data_df = pd.read_csv(ProjectConstants.UNCONSTRAINED_RECEIVER_DATA, header=0, encoding="utf-8",
-                                         skipinitialspace=True, delimiter=";")
+    def __init__(self, detections: pd.DataFrame = None):
+        """Reads TagDetections.csv, or prepares the given detections parsed with the same schema."""
+        if detections is None:
+            detections = read_telemetry_csv(ProjectConstants.UNCONSTRAINED_RECEIVER_DATA,
+                                            UNCONSTRAINED_DETECTIONS_SCHEMA)
+        self.excel_data_df = detections
         self.add_fish_numbers(self.excel_data_df)
         self.add_3_hours()  # Crete is UTC +3
         self.change_names()
@@ -63,18 +125,18 @@ class UnconstrainedTransmitterDataSheet:
         return self.excel_data_df
 
     def add_fish_numbers(self, df):
-        df["fish_number"] = -1
-        for idx, df_partly in df.groupby("ID"):
-            if idx % 2 == 0:
-                df.loc[df["ID"] == idx, "fish_number"] = idx - 1
-            else:
-                df.loc[df["ID"] == idx, "fish_number"] = idx
+        # The even (activity) ID belongs to the fish of the odd ID below it
+        identifiers = df["ID"].to_numpy()
+        df["fish_number"] = np.where(identifiers % 2 == 0, identifiers - 1, identifiers)
+        unique_identifiers = np.unique(identifiers)
+        report_unpaired_tags(dict(zip(unique_identifiers.tolist(),
+                                      np.where(unique_identifiers % 2 == 0, unique_identifiers - 1,
+                                               unique_identifiers).tolist())))
         return df
 
     def add_3_hours(self):
 
-        self.excel_data_df["Time (corrected)"] = pd.to_datetime(
-            self.excel_data_df["Date and Time (UTC)"]) + pd.DateOffset(hours=3)
+        self.excel_data_df["Time (corrected)"] = self.excel_data_df["Date and Time (UTC)"] + pd.DateOffset(hours=3)
         self.excel_data_df = self.excel_data_df.set_index(["Protocol", "ID", "Time (corrected)"], drop=False)
         self.excel_data_df = self.excel_data_df.drop(columns="Date and Time (UTC)")
 
@@ -82,11 +144,6 @@ class UnconstrainedTransmitterDataSheet:
         self.excel_data_df['SNR [dB]'] = self.excel_data_df["SNR"]
         self.excel_data_df['Data2 (DS256 only)'] = self.excel_data_df["Data2"]
         self.excel_data_df["datum"] = self.excel_data_df["Time (corrected)"]
-        # Fx depth
-        self.excel_data_df["Depth [m] (est. or from tag)"] = self.excel_data_df[
-            "Depth [m] (est. or from tag)"].str.replace(",", ".")
-        self.excel_data_df['Depth [m] (est. or from tag)'] = self.excel_data_df["Depth [m] (est. or from tag)"].astype(
-            float)
 
 
 
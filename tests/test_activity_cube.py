@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.fish_telemetry_faa.utils.activity_cube import ActivityCube
+
+
+def _detections(seed=0):
+    rng = np.random.default_rng(seed)
+    frames = []
+    # The fish start on different days and times, and fish 1006 pauses for a few hours
+    for fish, start, hours in [(1002, "2021-05-26 05:17:23", 30), (1004, "2021-05-26 13:02:00", 20),
+                               (1006, "2021-05-27 02:45:10", 26)]:
+        seconds = np.sort(rng.integers(0, hours * 3600, 1500))
+        if fish == 1006:
+            seconds = seconds[(seconds < 6 * 3600) | (seconds > 10 * 3600)]
+        is_activity = rng.random(len(seconds)) < 0.5
+        frames.append(pd.DataFrame({
+            "fish_number": fish, "Time (corrected)": pd.Timestamp(start) + pd.to_timedelta(seconds, unit="s"),
+            "is_activity": is_activity, "is_temperature": ~is_activity,
+            "activity": np.where(is_activity, rng.gamma(2, 0.5, len(seconds)), -1),
+            "temperature": np.where(~is_activity, rng.normal(21, 0.5, len(seconds)), -1)}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def _resampled(df, minutes, sensor, fish):
+    selected = df.loc[df[f"is_{sensor}"] & df["fish_number"].isin(fish)]
+    table = selected.resample(f'{minutes}min', label='left', closed='left', offset="0min",
+                              on="Time (corrected)")[[sensor]].agg(["count", "mean", "std"])
+    return table.rename_axis("Time (corrected)")
+
+
+@pytest.fixture(scope="module")
+def detections():
+    return _detections()
+
+
+@pytest.fixture(scope="module")
+def cube(detections):
+    return ActivityCube.from_frame(detections)
+
+
+@pytest.mark.parametrize("minutes", [1, 5, 20, 60])
+@pytest.mark.parametrize("sensor", ["activity", "temperature"])
+@pytest.mark.parametrize("fish", [None, [1006], [1004, 1006]])
+def test_cube_slices_match_the_resampled_detections(detections, cube, minutes, sensor, fish):
+    expected = _resampled(detections, minutes, sensor, fish or [1002, 1004, 1006])
+    pd.testing.assert_frame_equal(cube.binned(minutes, sensor, fish), expected, check_freq=False)
+
+
+def test_saved_cube_gives_the_same_slices(tmp_path, cube):
+    file = tmp_path.joinpath("cube.npz")
+    cube.save(file)
+    pd.testing.assert_frame_equal(ActivityCube.load(file).binned(20, "activity", [1004]),
+                                  cube.binned(20, "activity", [1004]))
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.fish_telemetry_faa.utils.binning import BIN_STATISTICS, BINNED_COLUMNS, bin_statistics
+
+
+def _detections(seed=0):
+    rng = np.random.default_rng(seed)
+    # Starts in the middle of a day and leaves a gap of several hours, so there are empty bins
+    seconds = np.sort(np.concatenate([rng.integers(0, 8 * 3600, 1500), rng.integers(14 * 3600, 40 * 3600, 2500)]))
+    df = pd.DataFrame({"Time (corrected)": pd.Timestamp("2021-05-26 05:17:23") + pd.to_timedelta(seconds, unit="s"),
+                       "activity": rng.gamma(2, 0.5, len(seconds)),
+                       "temperature": rng.normal(21, 0.5, len(seconds)),
+                       "Depth [m] (est. or from tag)": rng.uniform(0, 9, len(seconds))})
+    # Only some detections carry each sensor
+    df.loc[rng.random(len(df)) < 0.5, "activity"] = np.nan
+    df.loc[df["activity"].notna(), "temperature"] = np.nan
+    return df
+
+
+@pytest.mark.parametrize("minutes", [5, 7, 20, 60])
+def test_bin_statistics_match_resample(minutes):
+    df = _detections()
+    expected = df.resample(f'{minutes}min', label='left', closed='left', offset="0min",
+                           on="Time (corrected)")[BINNED_COLUMNS].agg(BIN_STATISTICS)
+    table = bin_statistics(df, minutes)
+    assert (table[("activity", "count")] == 0).any()
+    pd.testing.assert_frame_equal(table, expected, check_freq=False, check_dtype=False)
+    for column in BINNED_COLUMNS:
+        assert table[(column, "count")].dtype == np.int64
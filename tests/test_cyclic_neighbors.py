@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from src.fish_telemetry_faa.clustering.cyclic_neighbors import cluster_time_depth, cyclic_radius_neighbors_graph, \
+    cyclic_time_depth_distances
+
+
+def _points_across_midnight(seed=0):
+    rng = np.random.default_rng(seed)
+    # A group around midnight, split over 23:xx and 0:xx, one at noon and scattered noise
+    midnight_times = rng.normal(0, 0.3, 300) % 24
+    noon_times = rng.normal(12, 0.3, 200)
+    noise_times = rng.uniform(0, 24, 100)
+    depths = np.concatenate([rng.normal(2, 0.3, 300), rng.normal(6, 0.3, 200), rng.uniform(0, 9, 100)])
+    return depths, np.concatenate([midnight_times, noon_times, noise_times])
+
+
+def test_neighbors_graph_holds_the_dense_distances_below_the_radius():
+    depths, times = _points_across_midnight()
+    radius = 0.5
+    dense = cyclic_time_depth_distances(depths, times)
+    graph = cyclic_radius_neighbors_graph(depths, times, radius).tocoo()
+    assert set(zip(graph.row, graph.col)) == set(zip(*np.nonzero(dense <= radius)))
+    np.testing.assert_allclose(graph.data, dense[graph.row, graph.col], atol=1e-12)
+
+
+@pytest.mark.parametrize("eps, min_samples", [(0.5, 10), (0.3, 25)])
+def test_neighbors_and_dense_give_the_same_labels(eps, min_samples):
+    depths, times = _points_across_midnight()
+    dense_labels = cluster_time_depth(depths, times, eps, min_samples, method="dense")
+    neighbors_labels = cluster_time_depth(depths, times, eps, min_samples, method="neighbors")
+    np.testing.assert_array_equal(neighbors_labels, dense_labels)
+    # The points on both sides of midnight form one cluster
+    midnight_labels = dense_labels[:300]
+    assert len(set(midnight_labels[(times[:300] > 23.5) | (times[:300] < 0.5)]) - {-1}) == 1
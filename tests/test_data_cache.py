@@ -0,0 +1,72 @@
+import datetime
+import os
+
+import pandas as pd
+import pytest
+
+from src.fish_telemetry_faa.utils import data_cache
+from src.fish_telemetry_faa.utils.data_cache import cache_key, load_cached_frame, store_cached_frame
+from src.fish_telemetry_faa.utils.project_constants import ProjectConstants
+from src.fish_telemetry_faa.utils.telemetry_schema import PYARROW_AVAILABLE
+
+CACHE_SUFFIXES = [".pkl"] + ([".parquet"] if PYARROW_AVAILABLE else [])
+
+
+@pytest.fixture
+def cache_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(ProjectConstants, "CACHE", tmp_path.joinpath("cache"))
+    pipeline_file = tmp_path.joinpath("loader.py")
+    pipeline_file.write_text("STEPS = 1\n")
+    monkeypatch.setattr(data_cache, "PIPELINE_SOURCES", [pipeline_file])
+    return tmp_path
+
+
+def _load(source, builds):
+    key = cache_key("test", [source], dict(short_nights=True))
+    df = load_cached_frame(key)
+    if df is None:
+        builds.append(key)
+        df = pd.read_csv(source)
+        store_cached_frame(key, df)
+    return df
+
+
+def _bump_mtime(file):
+    stat = file.stat()
+    os.utime(file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def test_changed_sources_and_code_rebuild_the_cached_frame(cache_directory):
+    source = cache_directory.joinpath("source.csv")
+    source.write_text("a\n1\n")
+    builds = []
+    _load(source, builds)
+    _load(source, builds)
+    assert len(builds) == 1
+    _bump_mtime(source)
+    _load(source, builds)
+    assert len(builds) == 2
+    source.write_text("a\n1\n2\n")
+    assert len(_load(source, builds)) == 2
+    assert len(builds) == 3
+    pipeline_file = data_cache.PIPELINE_SOURCES[0]
+    pipeline_file.write_text("STEPS = 2\n")
+    _load(source, builds)
+    assert len(builds) == 4
+    # Only the frame of the current sources is kept
+    assert len(list(ProjectConstants.CACHE.glob(f"*{data_cache.CACHE_SUFFIX}"))) == 1
+
+
+@pytest.mark.parametrize("suffix", CACHE_SUFFIXES)
+def test_round_trip_keeps_time_date_and_categorical_columns(cache_directory, monkeypatch, suffix):
+    monkeypatch.setattr(data_cache, "CACHE_SUFFIX", suffix)
+    times = pd.DatetimeIndex(["2021-05-26 04:10:00", "2021-05-26 12:00:30", "2021-05-27 21:59:59"])
+    df = pd.DataFrame({"Name": pd.Categorical(["T-1001", "T-1002", "T-1001"]),
+                       "time_of_day": pd.Categorical(["Night", "Day", "Night"], categories=["Night", "Day"]),
+                       "datum": times, "temp_id": times.date, "time": times.time,
+                       "sunrise_official": [datetime.time(5, 5), datetime.time(5, 5), datetime.time(5, 4)],
+                       "activity": [0.5, 1.5, -1.0], "Time (corrected)": times})
+    # The index levels share their names with columns, like set_index(..., drop=False) in the loaders
+    df = df.set_index(["Name", "Time (corrected)"], drop=False)
+    store_cached_frame("round_trip", df)
+    pd.testing.assert_frame_equal(load_cached_frame("round_trip"), df)
@@ -0,0 +1,22 @@
+import pandas as pd
+
+from src.fish_telemetry_faa.utils.data_session import DataSession
+
+
+def test_frames_are_loaded_once_and_handed_out_as_independent_copies():
+    calls = []
+
+    def init_frame():
+        calls.append(1)
+        return pd.DataFrame({"activity": [1.0, 2.0, 3.0], "temperature": [20.0, 21.0, 22.0]})
+
+    session = DataSession()
+    first = session._memoized(init_frame)
+    first["activity"] += 1
+    first.loc[first["temperature"] > 20, "temperature"] = 0
+    first["new_column"] = 1
+    second = session._memoized(init_frame)
+    assert len(calls) == 1
+    assert second["activity"].tolist() == [1.0, 2.0, 3.0]
+    assert second["temperature"].tolist() == [20.0, 21.0, 22.0]
+    assert "new_column" not in second.columns
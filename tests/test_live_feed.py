@@ -0,0 +1,31 @@
+import pandas as pd
+
+from src.fish_telemetry_faa.utils.live_feed import LiveTelemetryFeed
+from src.fish_telemetry_faa.utils.sun_times import SunTimer
+
+HEADER = "Time (UTC),Name,SNR [dB],HDOP,Depth [m] (est. or from tag),Data2 (DS256 only)\n"
+
+
+def _append_detections(file, name, times):
+    new_file = not file.exists()
+    with open(file, "a", encoding="utf-8") as stream:
+        if new_file:
+            stream.write(HEADER)
+        stream.writelines(f"{time},{name},30.0,1.0,4.5,100\n" for time in times)
+
+
+def test_partner_tag_in_a_later_tail_renumbers_the_window(tmp_path):
+    sun_timer = SunTimer.from_solar_position("2021-05-26", "2021-05-28")
+    feed = LiveTelemetryFeed(tmp_path, kind="constrained", sun_timer=sun_timer)
+    _append_detections(tmp_path.joinpath("T-1002.csv"), "T-1002", ["2021-05-26 08:00:00", "2021-05-26 08:05:00"])
+    feed.poll()
+    # Alone, the activity tag is taken for the temperature tag of the next fish
+    assert set(feed.frame["fish_number"]) == {1003}
+    _append_detections(tmp_path.joinpath("T-1001.csv"), "T-1001", ["2021-05-26 08:10:00"])
+    _append_detections(tmp_path.joinpath("T-1002.csv"), "T-1002", ["2021-05-26 08:15:00"])
+    feed.poll()
+    assert len(feed.frame) == 4
+    assert set(feed.frame["fish_number"]) == {1002}
+    assert feed.frame.groupby("Name", observed=True)["fish_number"].first().to_dict() == {"T-1001": 1002,
+                                                                                          "T-1002": 1002}
+    assert (feed.frame["Time (corrected)"] == pd.Timestamp("2021-05-26 11:15:00")).sum() == 1
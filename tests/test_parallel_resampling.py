@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.fish_telemetry_faa.statistics.shuffle_time import run_shuffle_test
+from src.fish_telemetry_faa.statistics.subset_sum_permutation import mean_difference_permutation_tests
+
+
+def _water_column_detections(seed=0):
+    rng = np.random.default_rng(seed)
+    seconds = np.sort(rng.integers(0, 2 * 24 * 3600, 3000))
+    return pd.DataFrame({"Time (corrected)": pd.Timestamp("2021-05-26") + pd.to_timedelta(seconds, unit="s"),
+                         "water_column": rng.choice(["0-3m", "3-6m", "6-9m"], len(seconds))})
+
+
+def _shuffle_test(df, n_workers, block_size):
+    # The base counts are shuffled from the global generator, like before the repetitions were parallel
+    np.random.seed(0)
+    return run_shuffle_test(df, repetitions=40, interval_minutes=30, verbose=False, n_workers=n_workers,
+                            block_size=block_size)
+
+
+@pytest.mark.parametrize("n_workers, block_size", [(3, 7), (1, 13), (3, 40)])
+def test_shuffle_and_fisher_results_do_not_depend_on_workers_or_blocks(n_workers, block_size):
+    df = _water_column_detections()
+    reference_results, reference_combined = _shuffle_test(df, n_workers=1, block_size=40)
+    results, combined = _shuffle_test(df, n_workers=n_workers, block_size=block_size)
+    for (stat, p), (reference_stat, reference_p) in zip(results, reference_results):
+        np.testing.assert_array_equal(stat, reference_stat)
+        np.testing.assert_array_equal(p, reference_p)
+    assert combined == reference_combined
+
+
+def test_monte_carlo_permutation_tests_do_not_depend_on_workers():
+    rng = np.random.default_rng(1)
+    samples = {name: rng.normal(mean, 1, 40) for name, mean in [("0-3m", 0), ("3-6m", 0.3), ("6-9m", 0.5)]}
+    comparisons = [(("0-3m", "3-6m"), "two-sided"), (("0-3m", "3-6m", "6-9m"), "greater")]
+    results = [mean_difference_permutation_tests(samples, comparisons, n_resamples=2000, method="monte_carlo",
+                                                 n_workers=n_workers, block_size=300) for n_workers in (1, 3)]
+    pd.testing.assert_frame_equal(results[0], results[1])
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.fish_telemetry_faa.utils.pinpoint_data_converter import exclude_data2_or_depth_outliers, outlier_scores
+
+
+def _temperatures(groups_of_values):
+    names = [name for name, values in groups_of_values.items() for _ in values]
+    temperatures = [value for values in groups_of_values.values() for value in values]
+    return pd.DataFrame({"Name": names, "temperature": temperatures, "is_temperature": True,
+                         "Time (corrected)": pd.Timestamp("2021-05-26") + pd.to_timedelta(np.arange(len(names)),
+                                                                                         unit="min")})
+
+
+@pytest.mark.parametrize("method", ["mad", "rolling"])
+def test_constant_and_single_value_groups_keep_their_values(method):
+    df = _temperatures({"Tag-1": [21.5] * 11, "Tag-3": [20.0]})
+    assert np.array_equal(outlier_scores(df["temperature"], df["Name"], method=method, times=df["Time (corrected)"]),
+                          np.zeros(12))
+    assert len(exclude_data2_or_depth_outliers(df, "temperature", method=method)) == 12
+
+
+def test_mad_falls_back_to_the_mean_absolute_deviation():
+    df = _temperatures({"Tag-1": [21.5] * 10 + [30.0]})
+    scores = outlier_scores(df["temperature"], df["Name"], method="mad")
+    assert np.array_equal(scores[:10], np.zeros(10))
+    assert scores[10] > 3
+    assert len(exclude_data2_or_depth_outliers(df, "temperature", method="mad")) == 10
+
+
+def test_rolling_scores_the_first_value_of_every_group_zero():
+    df = _temperatures({"Tag-1": [21.0, 22.0, 21.5], "Tag-3": [19.0, 20.0]})
+    scores = outlier_scores(df["temperature"], df["Name"], method="rolling", times=df["Time (corrected)"])
+    assert scores[0] == 0 and scores[3] == 0
+    assert np.isfinite(scores).all()
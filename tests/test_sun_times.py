@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.fish_telemetry_faa.utils.filter_util import get_data_between_hour_times
+from src.fish_telemetry_faa.utils.sun_times import TIME_OF_DAY_INTERVALS, SunTimer, add_time_of_day_intervals, \
+    correlate_sun_timer_with_fish_positions
+
+
+@pytest.fixture(scope="module")
+def sun_timer():
+    return SunTimer.from_solar_position("2021-05-26", "2021-05-28")
+
+
+def _detections_at(times):
+    times = pd.DatetimeIndex(times)
+    return pd.DataFrame({"Time (corrected)": times}, index=times)
+
+
+def _time_of_day_intervals(sun_timer, times, short_nights):
+    df = correlate_sun_timer_with_fish_positions(_detections_at(times), sun_timer)
+    return add_time_of_day_intervals(df, short_nights=short_nights)
+
+
+def _float_hours(time):
+    return time.hour + (time.minute / 60) + (time.second / 3600)
+
+
+def _reference_time_of_day_intervals(df, short_nights):
+    # The per date get_data_between_hour_times selections of the original implementation
+    sun_rise_column, sun_set_column = ("sunrise_astronomical", "sunset_astronomical") if short_nights else \
+        ("sunrise_official", "sunset_official")
+    in_interval_time = (df["time_of_day"] != "Night") if short_nights else (df["time_of_day"] == "Day")
+    labels = pd.Series("Official Night Time", index=df.index)
+    for date in sorted(set(df["temp_id"])):
+        df_small_date = df.loc[df["temp_id"] == date]
+        bounds = [_float_hours(df_small_date[sun_rise_column].iloc[0]), 8, 10, 12, 14, 16,
+                  _float_hours(df_small_date[sun_set_column].iloc[0])]
+        for interval, time_first, time_last in zip(TIME_OF_DAY_INTERVALS, bounds[:-1], bounds[1:]):
+            selected = get_data_between_hour_times(df_small_date.copy(), time_first, time_last).index
+            labels.loc[selected] = interval
+    return labels.where(in_interval_time, "Official Night Time").to_numpy()
+
+
+@pytest.mark.parametrize("short_nights, sun_rise_column, sun_set_column", [
+    (True, "sunrise_astronomical", "sunset_astronomical"),
+    (False, "sunrise_official", "sunset_official"),
+])
+def test_detections_at_the_exact_interval_bounds(sun_timer, short_nights, sun_rise_column, sun_set_column):
+    date = sun_timer.dates[1]
+    sun_rise = pd.Timedelta(seconds=int(sun_timer.seconds(sun_rise_column)[1]))
+    sun_set = pd.Timedelta(seconds=int(sun_timer.seconds(sun_set_column)[1]))
+    one_second = pd.Timedelta(seconds=1)
+    times = [date + sun_rise, date + sun_rise + one_second, date + pd.Timedelta(hours=8),
+             date + pd.Timedelta(hours=8) + one_second, date + pd.Timedelta(hours=16),
+             date + sun_set - one_second, date + sun_set]
+    df = _time_of_day_intervals(sun_timer, times, short_nights)
+    assert list(df["time_of_day_interval"]) == ["Official Night Time", "Sunrise to 8:00", "Sunrise to 8:00",
+                                                "8:00 to 10:00", "14:00 to 16:00", "16:00 to Sunset",
+                                                "Official Night Time"]
+
+
+@pytest.mark.parametrize("short_nights", [True, False])
+def test_intervals_match_the_per_date_selections(sun_timer, short_nights):
+    times = pd.date_range("2021-05-26", "2021-05-28 23:59:59", freq="s")
+    df = _time_of_day_intervals(sun_timer, times, short_nights)
+    assert np.array_equal(df["time_of_day_interval"].to_numpy(), _reference_time_of_day_intervals(df, short_nights))
+
+
+def _reference_time_of_day(df):
+    # The per twilight boolean masks of the original implementation, applied in the same order
+    time_of_day = pd.Series("INVALID", index=range(len(df)))
+    time = df["time"].to_numpy()
+
+    def between(lower_column, upper_column):
+        return (df[lower_column].to_numpy() <= time) & (time < df[upper_column].to_numpy())
+
+    time_of_day[between("sunrise_official", "sunset_official")] = "Day"
+    time_of_day[between("sunset_official", "sunset_civil")] = "Civil Twilight"
+    time_of_day[between("sunset_civil", "sunset_nautical")] = "Nautical Twilight"
+    time_of_day[between("sunset_nautical", "sunset_astronomical")] = "Astronomical Twilight"
+    time_of_day[(df["sunset_astronomical"].to_numpy() <= time) | (time < df["sunrise_astronomical"].to_numpy())] = \
+        "Night"
+    time_of_day[between("sunrise_astronomical", "sunrise_nautical")] = "Astronomical Twilight"
+    time_of_day[between("sunrise_nautical", "sunrise_civil")] = "Nautical Twilight"
+    time_of_day[between("sunrise_civil", "sunrise_official")] = "Civil Twilight"
+    return time_of_day.to_numpy()
+
+
+def test_time_of_day_matches_the_per_twilight_masks(sun_timer):
+    rng = np.random.default_rng(0)
+    random_seconds = rng.integers(0, len(sun_timer.dates) * 24 * 3600, 20000)
+    boundary_seconds = (sun_timer.twilight_boundary_seconds() +
+                        np.arange(len(sun_timer.dates))[:, None] * 24 * 3600).ravel()
+    seconds = np.concatenate([random_seconds, boundary_seconds - 1, boundary_seconds, boundary_seconds + 1])
+    times = sun_timer.dates[0] + pd.to_timedelta(np.unique(seconds), unit="s")
+    df = correlate_sun_timer_with_fish_positions(_detections_at(times), sun_timer)
+    assert np.array_equal(df["time_of_day"].astype(str).to_numpy(), _reference_time_of_day(df))
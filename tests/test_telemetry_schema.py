@@ -0,0 +1,29 @@
+import pandas as pd
+import pytest
+
+from src.fish_telemetry_faa.utils.telemetry_schema import PYARROW_AVAILABLE, UNCONSTRAINED_DETECTIONS_SCHEMA, \
+    read_telemetry_csv
+
+DETECTIONS = ("Date and Time (UTC);ID;SNR;Data2;Depth [m] (est. or from tag)\n"
+              "2021-05-26 08:00:00;1001;30.5;112.5;4,5\n"
+              "2021-05-26 08:01:00;1002;28;40;3\n")
+ENGINES = ["c"] + (["pyarrow"] if PYARROW_AVAILABLE else [])
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_only_the_decimal_columns_use_the_comma(tmp_path, engine):
+    file = tmp_path.joinpath("TagDetections.csv")
+    file.write_text(DETECTIONS, encoding="utf-8")
+    df = read_telemetry_csv(file, UNCONSTRAINED_DETECTIONS_SCHEMA, engine=engine)
+    assert df["SNR"].tolist() == [30.5, 28.0]
+    assert df["Data2"].tolist() == [112.5, 40.0]
+    assert df["Depth [m] (est. or from tag)"].tolist() == [4.5, 3.0]
+    assert df["Date and Time (UTC)"].iloc[0] == pd.Timestamp("2021-05-26 08:00:00")
+
+
+def test_chunked_reads_convert_every_chunk(tmp_path):
+    file = tmp_path.joinpath("TagDetections.csv")
+    file.write_text(DETECTIONS, encoding="utf-8")
+    chunks = list(read_telemetry_csv(file, UNCONSTRAINED_DETECTIONS_SCHEMA, chunksize=1))
+    assert pd.concat(chunks)["Depth [m] (est. or from tag)"].tolist() == [4.5, 3.0]
+    assert pd.concat(chunks)["SNR"].dtype == "float64"